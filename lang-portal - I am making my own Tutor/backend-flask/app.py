@@ -1,13 +1,20 @@
 from flask import Flask, g
 from flask_cors import CORS
 
-from lib.db import Db
+from lib.db import Db, SqlProfiler, ShardRouter
+from lib.metrics import Metrics
+from lib.serialization import JSONProvider
+from lib.compression import Compression
+from lib.review_buffer import ReviewBuffer
+from lib.result_cache import ResultCache
 
 import routes.words
 import routes.groups
 import routes.study_sessions
 import routes.dashboard
 import routes.study_activities
+import routes.export
+import routes.metrics
 
 def get_allowed_origins(app):
     try:
@@ -30,16 +37,105 @@ def get_allowed_origins(app):
 
 def create_app(test_config=None):
     app = Flask(__name__)
+    # orjson when installed, and MessagePack for clients that ask for it
+    app.json = JSONProvider(app)
     
     if test_config is None:
         app.config.from_mapping(
-            DATABASE='words.db'
+            DATABASE='words.db',
+            DB_POOL_SIZE=5,
+            DB_POOL_TIMEOUT=10.0,
+            DB_BUSY_TIMEOUT=5000,
+            DB_CACHE_SIZE=-20000,
+            DB_MMAP_SIZE=268435456,
+            SQL_PROFILE=False,
+            SQL_SLOW_QUERY_MS=100,
+            SQL_SLOW_QUERY_LOG='logs/slow_queries.log',
+            SQL_PROFILE_HEADER=True,
+            METRICS=False,
+            COMPRESS=True,
+            COMPRESS_MIN_SIZE=1024,
+            REVIEW_WRITE_BEHIND=False,
+            REVIEW_FLUSH_ROWS=500,
+            REVIEW_FLUSH_MS=50,
+            REVIEW_BUFFER_CAPACITY=10000,
+            REVIEW_BUFFER_TIMEOUT=1.0,
+            REVIEW_JOURNAL=None,
+            SHARDING=False,
+            SHARD_DIR='shards',
+            SHARD_HEADER='X-Learner-Id',
+            SHARD_MAX_OPEN=64,
+            SHARD_POOL_SIZE=2,
+            RESULT_CACHE=True,
+            RESULT_CACHE_SIZE=256,
+            RESULT_CACHE_TTL=300,
+            RESULT_CACHE_PATH=None,
+            DUE_LEASE_MINUTES=10
         )
     else:
         app.config.update(test_config)
     
     # Initialize database first since we need it for CORS configuration
-    app.db = Db(database=app.config['DATABASE'])
+    app.db = Db(
+        database=app.config['DATABASE'],
+        pool_size=app.config.get('DB_POOL_SIZE', 5),
+        pool_timeout=app.config.get('DB_POOL_TIMEOUT', 10.0),
+        busy_timeout=app.config.get('DB_BUSY_TIMEOUT', 5000),
+        cache_size=app.config.get('DB_CACHE_SIZE', -20000),
+        mmap_size=app.config.get('DB_MMAP_SIZE', 268435456)
+    )
+
+    # Opt-in per-learner databases: requests carrying SHARD_HEADER read and write
+    # their own shard, with the vocabulary attached read-only from DATABASE
+    if app.config.get('SHARDING'):
+        ShardRouter(
+            app.db,
+            directory=app.config.get('SHARD_DIR', 'shards'),
+            max_open=app.config.get('SHARD_MAX_OPEN', 64),
+            pool_size=app.config.get('SHARD_POOL_SIZE', 2),
+            header=app.config.get('SHARD_HEADER', 'X-Learner-Id')
+        ).init_app(app)
+
+    # Opt-in per-request SQL profiling (must be installed before the pool opens connections)
+    if app.config.get('SQL_PROFILE'):
+        SqlProfiler(
+            slow_query_ms=app.config.get('SQL_SLOW_QUERY_MS', 100),
+            log_path=app.config.get('SQL_SLOW_QUERY_LOG', 'logs/slow_queries.log'),
+            header=app.config.get('SQL_PROFILE_HEADER', True)
+        ).init_app(app)
+
+    # gzip/brotli for JSON (and other text) responses above the size threshold
+    if app.config.get('COMPRESS', True):
+        Compression(min_size=app.config.get('COMPRESS_MIN_SIZE', 1024)).init_app(app)
+
+    # Opt-in write-behind for review submissions: batched inserts on a background
+    # thread. REVIEW_JOURNAL (a file path) makes queued reviews survive a crash.
+    # Whatever is still queued is flushed when the app is closed or the process exits.
+    if app.config.get('REVIEW_WRITE_BEHIND'):
+        ReviewBuffer(
+            app.db,
+            max_rows=app.config.get('REVIEW_FLUSH_ROWS', 500),
+            interval_ms=app.config.get('REVIEW_FLUSH_MS', 50),
+            capacity=app.config.get('REVIEW_BUFFER_CAPACITY', 10000),
+            put_timeout=app.config.get('REVIEW_BUFFER_TIMEOUT', 1.0),
+            journal_path=app.config.get('REVIEW_JOURNAL')
+        ).init_app(app)
+
+    # Finished bodies of the expensive aggregate routes, keyed by their ETag;
+    # RESULT_CACHE_PATH adds an on-disk tier shared between processes
+    if app.config.get('RESULT_CACHE', True):
+        ResultCache(
+            max_entries=app.config.get('RESULT_CACHE_SIZE', 256),
+            ttl=app.config.get('RESULT_CACHE_TTL', 300),
+            disk_path=app.config.get('RESULT_CACHE_PATH')
+        ).init_app(app)
+
+    # Opt-in Prometheus metrics at /metrics. They time every statement through
+    # the SQL profiler (record-only unless SQL_PROFILE is on), so they are off by
+    # default like SQL_PROFILE
+    if app.config.get('METRICS'):
+        app.metrics = Metrics()
+        app.metrics.init_app(app)
     
     # Get allowed origins from study_activities table
     allowed_origins = get_allowed_origins(app)
@@ -53,11 +149,12 @@ def create_app(test_config=None):
         r"/*": {
             "origins": allowed_origins,
             "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-            "allow_headers": ["Content-Type", "Authorization"]
+            "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key",
+                              app.config.get('SHARD_HEADER', 'X-Learner-Id')]
         }
     })
 
-    # Close database connection
+    # Return the database connection to the pool
     @app.teardown_appcontext
     def close_db(exception):
         app.db.close()
@@ -68,6 +165,9 @@ def create_app(test_config=None):
     routes.study_sessions.load(app)
     routes.dashboard.load(app)
     routes.study_activities.load(app)
+    routes.export.load(app)
+    if app.config.get('METRICS'):
+        routes.metrics.load(app)
     
     return app
 
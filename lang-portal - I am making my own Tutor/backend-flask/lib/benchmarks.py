@@ -0,0 +1,138 @@
+import json
+import os
+import sqlite3
+import tempfile
+import timeit
+
+from lib.serialization import orjson, msgpack, ORJSON_OPTIONS
+from lib.compression import CONTENT_CODINGS, Compression
+
+# Routes compared by benchmark_responses()
+RESPONSE_ROUTES = ['/words', '/api/study-sessions/1?per_page=50']
+
+# GET /words before migration 0012: COALESCE over a LEFT JOIN, and no index on
+# the text columns (NOT INDEXED stands in for the indexes that didn't exist)
+LEGACY_WORD_SORTS = {
+  'kanji': 'w.kanji',
+  'romaji': 'w.romaji',
+  'english': 'w.english',
+  'correct_count': 'COALESCE(r.correct_count, 0)',
+  'wrong_count': 'COALESCE(r.wrong_count, 0)'
+}
+
+def seed_session(app, reviews_per_word=3):
+  with app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute('INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1)')
+    session_id = cursor.lastrowid
+    cursor.executemany(
+      'INSERT INTO word_review_items (word_id, study_session_id, correct) VALUES (?, ?, ?)',
+      [(word_id, session_id, (word_id + attempt) % 3 != 0)
+       for word_id in range(1, 61) for attempt in range(reviews_per_word)]
+    )
+    app.db.commit()
+
+def serializers():
+  found = {
+    'json': lambda obj: json.dumps(obj, separators=(',', ':'), sort_keys=True).encode('utf-8')
+  }
+  if orjson is not None:
+    found['orjson'] = lambda obj: orjson.dumps(obj, option=ORJSON_OPTIONS)
+  if msgpack is not None:
+    found['msgpack'] = lambda obj: msgpack.packb(obj)
+  return found
+
+# The content codings the app would actually send, at its own settings
+def codings():
+  compression = Compression()
+  found = {'identity': lambda data: data}
+  for coding in CONTENT_CODINGS:
+    found[coding] = lambda data, coding=coding: compression.compress(data, coding)
+  return found
+
+def mean_us(function, number):
+  return min(timeit.repeat(function, number=number, repeat=5)) / number * 1e6
+
+# Add count synthetic words (and review counters for every seventh one) in one
+# transaction, through the same triggers the importer goes through
+def seed_words(database, count, batch_size=10000):
+  connection = sqlite3.connect(database)
+  with connection:
+    for start in range(0, count, batch_size):
+      connection.executemany(
+        'INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)',
+        [(f'語{n}', f'go{n:07d}', f'word {n}', '[]')
+         for n in range(start, min(start + batch_size, count))]
+      )
+    connection.execute('''
+      UPDATE word_reviews SET
+        correct_count = abs(random()) % 20,
+        wrong_count = abs(random()) % 10
+      WHERE word_id % 7 = 0
+    ''')
+  connection.execute('ANALYZE')
+  connection.close()
+
+def plan(connection, sql):
+  return '; '.join(row[3] for row in connection.execute('EXPLAIN QUERY PLAN ' + sql))
+
+# First page of GET /words for every sort, with the query the route ran before
+# migration 0012 and the one it runs now, over a database of words words.
+# Returns [(sort_by, order, legacy_ms, indexed_ms, indexed_plan)].
+def benchmark_word_sorts(create_app, run_migrations, words=500000, number=20):
+  from routes.words import WORD_LIST_SORTS
+
+  database = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+  app = create_app({'DATABASE': database, 'TESTING': True, 'METRICS': False, 'RESULT_CACHE': False})
+  app.db.init(app)
+  run_migrations(db_path=database)
+  app.db.dispose()
+  seed_words(database, words)
+
+  connection = sqlite3.connect(database)
+  results = []
+  for sort_by, (sort_expression, id_expression) in WORD_LIST_SORTS.items():
+    for order in ('asc', 'desc'):
+      legacy = f'''
+        SELECT w.id, w.kanji, w.romaji, w.english,
+            COALESCE(r.correct_count, 0), COALESCE(r.wrong_count, 0)
+        FROM words w NOT INDEXED
+        LEFT JOIN word_reviews r ON w.id = r.word_id
+        ORDER BY {LEGACY_WORD_SORTS[sort_by]} {order}, w.id {order}
+        LIMIT 50 OFFSET 0
+      '''
+      indexed = f'''
+        SELECT w.id, w.kanji, w.romaji, w.english, r.correct_count, r.wrong_count
+        FROM words w
+        JOIN word_reviews r ON w.id = r.word_id
+        ORDER BY {sort_expression} {order}, {id_expression} {order}
+        LIMIT 50 OFFSET 0
+      '''
+      legacy_ms = min(timeit.repeat(lambda: connection.execute(legacy).fetchall(), number=1, repeat=3)) * 1000
+      indexed_ms = min(timeit.repeat(lambda: connection.execute(indexed).fetchall(), number=number, repeat=3)) / number * 1000
+      results.append((sort_by, order, legacy_ms, indexed_ms, plan(connection, indexed)))
+  connection.close()
+  return results
+
+# Serialize each route's payload with every available serializer and content
+# coding. Returns [(route, serializer, coding, bytes, serialize_us, compress_us)].
+def benchmark_responses(create_app, run_migrations, number=2000):
+  database = os.path.join(tempfile.mkdtemp(), 'benchmark.db')
+  app = create_app({'DATABASE': database, 'TESTING': True, 'COMPRESS': False, 'METRICS': False})
+  app.db.init(app)
+  run_migrations(db_path=database)
+  seed_session(app)
+
+  client = app.test_client()
+  results = []
+  for route in RESPONSE_ROUTES:
+    payload = json.loads(client.get(route).data)
+    for serializer_name, serialize in serializers().items():
+      body = serialize(payload)
+      serialize_us = mean_us(lambda: serialize(payload), number)
+      for coding_name, compress in codings().items():
+        compressed = compress(body)
+        compress_us = mean_us(lambda: compress(body), max(number // 10, 1)) if coding_name != 'identity' else 0.0
+        results.append((route, serializer_name, coding_name, len(compressed), serialize_us, compress_us))
+  app.db.dispose()
+  return results
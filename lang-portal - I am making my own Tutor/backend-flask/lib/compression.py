@@ -0,0 +1,67 @@
+import gzip
+
+from flask import request
+
+# brotli is optional; without it responses are only ever gzipped
+try:
+  import brotli
+except ImportError:
+  brotli = None
+
+COMPRESSIBLE_MIMETYPES = {
+  'application/json',
+  'application/msgpack',
+  'application/x-ndjson',
+  'text/csv',
+  'text/plain'
+}
+
+# Content codings in order of preference (when the client accepts both equally)
+CONTENT_CODINGS = ('br', 'gzip') if brotli is not None else ('gzip',)
+
+# Strong ETags name one representation, so a compressed body gets the
+# uncompressed body's tag plus a suffix. lib/http_cache.py checks these too.
+def encoded_etags(etag):
+  return [f'{etag}-{coding}' for coding in CONTENT_CODINGS]
+
+# Compresses eligible responses after the view ran. Streamed responses (e.g. the
+# review export) are left alone: compressing them would mean buffering them.
+class Compression:
+  def __init__(self, min_size=1024, gzip_level=6, brotli_quality=5):
+    self.min_size = min_size
+    self.gzip_level = gzip_level
+    self.brotli_quality = brotli_quality
+
+  def init_app(self, app):
+    app.after_request(self.after_request)
+
+  def choose_coding(self):
+    accept = request.accept_encodings
+    best = max(CONTENT_CODINGS, key=lambda coding: accept[coding])
+    return best if accept[best] > 0 else None
+
+  def compress(self, data, coding):
+    if coding == 'br':
+      return brotli.compress(data, quality=self.brotli_quality)
+    return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+  def after_request(self, response):
+    if (response.mimetype not in COMPRESSIBLE_MIMETYPES
+        or response.direct_passthrough or response.is_streamed):
+      return response
+
+    response.vary.add('Accept-Encoding')
+    if (response.status_code != 200 or 'Content-Encoding' in response.headers
+        or response.content_length is None or response.content_length < self.min_size):
+      return response
+
+    coding = self.choose_coding()
+    if coding is None:
+      return response
+
+    response.set_data(self.compress(response.get_data(), coding))
+    response.headers['Content-Encoding'] = coding
+    etag, weak = response.get_etag()
+    if etag:
+      response.set_etag(f'{etag}-{coding}', weak)
+    return response
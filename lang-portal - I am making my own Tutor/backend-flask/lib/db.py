@@ -1,41 +1,694 @@
 import sqlite3
+import functools
 import json
-from flask import g
+import logging
+import os
+import queue
+import re
+import threading
+import time
+from collections import OrderedDict
+from logging.handlers import RotatingFileHandler
+from urllib.parse import quote
+from flask import g, has_app_context, has_request_context, jsonify, request
+
+class PoolTimeout(Exception):
+  pass
+
+WRITE_STATEMENT = re.compile(
+  r'^\s*(?:INSERT(?:\s+OR\s+\w+)?\s+INTO|REPLACE\s+INTO|UPDATE(?:\s+OR\s+\w+)?|DELETE\s+FROM)\s+["`\[]?(\w+)',
+  re.IGNORECASE
+)
+
+BUMP_TABLE_VERSION = '''
+  INSERT INTO table_versions (name, version, updated_at)
+  VALUES (?, 1, strftime('%Y-%m-%d %H:%M:%f', 'now'))
+  ON CONFLICT (name) DO UPDATE SET
+    version = version + 1,
+    updated_at = excluded.updated_at
+'''
+
+# Table a DML statement writes to (None for reads and DDL). Cached because the
+# same few statement strings are executed over and over.
+@functools.lru_cache(maxsize=1024)
+def written_table(sql):
+  match = WRITE_STATEMENT.match(sql)
+  return match.group(1).lower() if match else None
+
+# Type names of a parameter set, e.g. ['int', 'str'] or {'id': 'int'}. Only the
+# shape is profiled, never the values.
+def parameters_shape(parameters):
+  if isinstance(parameters, dict):
+    return {name: type(value).__name__ for name, value in parameters.items()}
+  return [type(value).__name__ for value in parameters]
+
+# Records every statement a request runs while profiling is on, then reports
+# them in a debug header and writes the slow ones, with their EXPLAIN QUERY
+# PLAN, to a rotating log. Installed by init_app() and off by default.
+# slow_query_ms=None records without logging (lib/metrics.py reads g.sql_profile).
+class SqlProfiler:
+  def __init__(self, slow_query_ms=100, log_path='logs/slow_queries.log',
+               max_bytes=5 * 1024 * 1024, backup_count=5, header=True):
+    self.slow_query_ms = slow_query_ms
+    self.header = header
+    self.logger = logging.getLogger('lang_portal.slow_queries')
+    self.logger.setLevel(logging.INFO)
+    self.logger.propagate = False
+    # One file handler per log file, however many apps (or other handlers) share the logger
+    if log_path and not any(getattr(handler, 'baseFilename', None) == os.path.abspath(log_path)
+                            for handler in self.logger.handlers):
+      os.makedirs(os.path.dirname(log_path) or '.', exist_ok=True)
+      self.logger.addHandler(RotatingFileHandler(log_path, maxBytes=max_bytes, backupCount=backup_count))
+
+  def init_app(self, app):
+    for pool in app.db.pools:
+      pool.profiler = self
+    app.after_request(self.after_request)
+
+  # sqlite3 trace callback: sees everything the connection executes, including
+  # statements run by executescript() and by triggers ("-- TRIGGER name")
+  def trace(self, statement):
+    if has_app_context():
+      g.sql_statements = g.get('sql_statements', 0) + 1
+
+  # Only the parameters' shape is kept: the values may be a whole import batch,
+  # and review contents have no place in the slow-query log
+  def record(self, sql, shape, executions, duration, rows):
+    if not has_app_context():
+      return None
+    entry = {
+      'sql': ' '.join(sql.split()),
+      'shape': shape,
+      'executions': executions,
+      'duration_ms': duration * 1000,
+      'rows': rows
+    }
+    g.setdefault('sql_profile', []).append(entry)
+    return entry
+
+  # The plan is explained with NULL bound to every parameter
+  def explain(self, entry):
+    shape = entry['shape']
+    parameters = dict.fromkeys(shape) if isinstance(shape, dict) else [None] * len(shape)
+    try:
+      # A plain cursor, so the EXPLAIN itself isn't profiled
+      cursor = g.db.cursor(sqlite3.Cursor)
+      rows = cursor.execute('EXPLAIN QUERY PLAN ' + entry['sql'], parameters).fetchall()
+    except (sqlite3.Error, AttributeError):
+      return None
+    return [row['detail'] for row in rows]
+
+  def after_request(self, response):
+    entries = g.get('sql_profile', [])
+    statements = g.get('sql_statements', 0)
+    total_ms = sum(entry['duration_ms'] for entry in entries)
+
+    slow = []
+    if self.slow_query_ms is not None:
+      slow = [entry for entry in entries if entry['duration_ms'] >= self.slow_query_ms]
+    for entry in slow:
+      self.logger.info(json.dumps({
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'method': request.method,
+        'path': request.full_path,
+        'endpoint': request.endpoint,
+        'sql': entry['sql'],
+        'parameters_shape': entry['shape'],
+        'executions': entry['executions'],
+        'duration_ms': round(entry['duration_ms'], 3),
+        'rows': entry['rows'],
+        'query_plan': self.explain(entry)
+      }))
+
+    if self.header:
+      response.headers['X-SQL-Profile'] = (
+        f'queries={len(entries)}; statements={statements}; '
+        f'time={total_ms:.2f}ms; slow={len(slow)}'
+      )
+      response.headers['Server-Timing'] = f'sql;dur={total_ms:.2f};desc="{len(entries)} queries"'
+    return response
+
+# Hands executemany() its parameters one set at a time, keeping only the shape
+# of the first set and how many there were
+class CountedParameters:
+  def __init__(self, seq_of_parameters):
+    self.parameters = iter(seq_of_parameters)
+    self.shape = []
+    self.count = 0
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    parameters = next(self.parameters)
+    if not self.count:
+      self.shape = parameters_shape(parameters)
+    self.count += 1
+    return parameters
+
+class TrackingCursor(sqlite3.Cursor):
+  profile_entry = None
+
+  def execute(self, sql, parameters=()):
+    table = written_table(sql)
+    if table:
+      self.connection.written_tables.add(table)
+    profiler = self.connection.profiler
+    if profiler is None:
+      return super().execute(sql, parameters)
+    started = time.perf_counter()
+    try:
+      return super().execute(sql, parameters)
+    finally:
+      # Reads count their rows as they are fetched, writes report rowcount
+      rows = self.rowcount if self.rowcount >= 0 else 0
+      self.profile_entry = profiler.record(
+        sql, parameters_shape(parameters), 1, time.perf_counter() - started, rows
+      )
+
+  def executemany(self, sql, seq_of_parameters):
+    table = written_table(sql)
+    if table:
+      self.connection.written_tables.add(table)
+    profiler = self.connection.profiler
+    if profiler is None:
+      return super().executemany(sql, seq_of_parameters)
+    counted = CountedParameters(seq_of_parameters)
+    started = time.perf_counter()
+    try:
+      return super().executemany(sql, counted)
+    finally:
+      self.profile_entry = profiler.record(
+        sql, counted.shape, counted.count, time.perf_counter() - started, max(self.rowcount, 0)
+      )
+
+  # Fetch time is part of a statement's cost: SQLite only steps to the first
+  # row inside execute()
+  def _fetched(self, rows, started):
+    self.profile_entry['duration_ms'] += (time.perf_counter() - started) * 1000
+    self.profile_entry['rows'] += rows
+
+  def fetchone(self):
+    if self.profile_entry is None:
+      return super().fetchone()
+    started = time.perf_counter()
+    row = super().fetchone()
+    self._fetched(0 if row is None else 1, started)
+    return row
+
+  def fetchmany(self, size=None):
+    if self.profile_entry is None:
+      return super().fetchmany(self.arraysize if size is None else size)
+    started = time.perf_counter()
+    rows = super().fetchmany(self.arraysize if size is None else size)
+    self._fetched(len(rows), started)
+    return rows
+
+  def fetchall(self):
+    if self.profile_entry is None:
+      return super().fetchall()
+    started = time.perf_counter()
+    rows = super().fetchall()
+    self._fetched(len(rows), started)
+    return rows
+
+  def __next__(self):
+    if self.profile_entry is None:
+      return super().__next__()
+    started = time.perf_counter()
+    try:
+      row = super().__next__()
+    except StopIteration:
+      self._fetched(0, started)
+      raise
+    self._fetched(1, started)
+    return row
+
+# Remembers which tables the open transaction wrote and bumps their row in
+# table_versions as part of the commit. The versions are what HTTP ETags (and
+# anything else that must notice writes) are derived from.
+class Connection(sqlite3.Connection):
+  def __init__(self, *args, **kwargs):
+    super().__init__(*args, **kwargs)
+    self.written_tables = set()
+    self.profiler = None
+
+  def cursor(self, factory=TrackingCursor):
+    return super().cursor(factory)
+
+  def execute(self, sql, parameters=()):
+    return self.cursor().execute(sql, parameters)
+
+  def executemany(self, sql, seq_of_parameters):
+    return self.cursor().executemany(sql, seq_of_parameters)
+
+  def bump_versions(self, tables):
+    try:
+      super().executemany(BUMP_TABLE_VERSION, [(table,) for table in sorted(tables)])
+    except sqlite3.OperationalError as e:
+      # Databases that predate migration 0006 simply aren't versioned yet
+      if 'table_versions' not in str(e):
+        raise
+
+  def commit(self):
+    if self.written_tables:
+      tables, self.written_tables = self.written_tables, set()
+      self.bump_versions(tables)
+    super().commit()
+
+  def rollback(self):
+    self.written_tables.clear()
+    super().rollback()
+
+# A bounded pool of long-lived SQLite connections. Each request checks a
+# connection out for the duration of its app context and hands it back on
+# teardown, so connect/close and page-cache warmup are paid once per
+# connection instead of once per request.
+class ConnectionPool:
+  def __init__(self, database, size=5, timeout=10.0, busy_timeout=5000,
+               cache_size=-20000, mmap_size=268435456, health_check_interval=30.0,
+               read_only=False, attach=None):
+    self.database = database
+    self.read_only = read_only
+    self.attach = attach or {}  # {schema name: database file}, attached read-only
+    self.size = size
+    self.timeout = timeout
+    self.busy_timeout = busy_timeout
+    self.cache_size = cache_size  # negative values are KiB, positive values are pages
+    self.mmap_size = mmap_size
+    self.health_check_interval = health_check_interval
+    self.profiler = None  # set by SqlProfiler.init_app()
+    self.closed = False
+
+    # LIFO so the most recently used (warmest) connection is handed out first
+    self._idle = queue.LifoQueue()
+    self._lock = threading.Lock()
+    self._open = 0
+    self._in_use = 0
+    self._stats = {
+      'acquired': 0,
+      'waits': 0,
+      'wait_time_total': 0.0,
+      'wait_time_max': 0.0,
+      'timeouts': 0,
+      'opened': 0,
+      'closed': 0,
+      'health_check_failures': 0
+    }
+
+  def connect(self):
+    uri = self.read_only or bool(self.attach)
+    if self.read_only:
+      # The journal mode is a property of the file; the writer sets WAL
+      database = f'file:{quote(os.path.abspath(self.database))}?mode=ro'
+    elif uri:
+      database = f'file:{quote(os.path.abspath(self.database))}'
+    else:
+      database = self.database
+    connection = sqlite3.connect(
+      database,
+      timeout=self.busy_timeout / 1000,
+      check_same_thread=False,  # connections move between request threads
+      factory=Connection,
+      uri=uri
+    )
+    connection.row_factory = sqlite3.Row  # Return rows as dictionaries
+    for schema, path in self.attach.items():
+      connection.execute(f'ATTACH DATABASE ? AS {schema}', (f'file:{quote(os.path.abspath(path))}?mode=ro',))
+    if not self.read_only:
+      connection.execute('PRAGMA journal_mode=WAL')
+    connection.execute(f'PRAGMA busy_timeout={int(self.busy_timeout)}')
+    connection.execute('PRAGMA synchronous=NORMAL')
+    connection.execute(f'PRAGMA cache_size={int(self.cache_size)}')
+    connection.execute(f'PRAGMA mmap_size={int(self.mmap_size)}')
+    connection.execute('PRAGMA temp_store=MEMORY')
+    if self.profiler is not None:
+      connection.profiler = self.profiler
+      connection.set_trace_callback(self.profiler.trace)
+    with self._lock:
+      self._stats['opened'] += 1
+    return connection
+
+  def healthy(self, connection):
+    try:
+      connection.execute('SELECT 1').fetchone()
+      return True
+    except sqlite3.Error:
+      return False
+
+  def acquire(self):
+    started = time.perf_counter()
+    waited = False
+    try:
+      connection, released_at = self._idle.get_nowait()
+    except queue.Empty:
+      with self._lock:
+        can_open = self._open < self.size
+        if can_open:
+          self._open += 1
+      if can_open:
+        connection, released_at = self._open_reserved(), None
+      else:
+        waited = True
+        try:
+          connection, released_at = self._idle.get(timeout=self.timeout)
+        except queue.Empty:
+          with self._lock:
+            self._stats['timeouts'] += 1
+          raise PoolTimeout(f'No database connection available after {self.timeout}s')
+
+    # Only connections that sat idle for a while are pinged before reuse
+    if released_at is not None and time.monotonic() - released_at > self.health_check_interval:
+      if not self.healthy(connection):
+        self._discard(connection)
+        with self._lock:
+          self._stats['health_check_failures'] += 1
+          self._open += 1
+        connection = self._open_reserved()
+
+    wait_time = time.perf_counter() - started
+    with self._lock:
+      self._in_use += 1
+      self._stats['acquired'] += 1
+      if waited:
+        self._stats['waits'] += 1
+      self._stats['wait_time_total'] += wait_time
+      self._stats['wait_time_max'] = max(self._stats['wait_time_max'], wait_time)
+    return connection
+
+  # Open a connection for a slot already counted in self._open
+  def _open_reserved(self):
+    try:
+      return self.connect()
+    except Exception:
+      with self._lock:
+        self._open -= 1
+      raise
+
+  def release(self, connection):
+    with self._lock:
+      self._in_use -= 1
+    if self.closed:
+      self._discard(connection)
+      return
+    try:
+      # Never hand a half-finished transaction to the next request
+      if connection.in_transaction:
+        connection.rollback()
+    except sqlite3.Error:
+      self._discard(connection)
+      return
+    self._idle.put((connection, time.monotonic()))
+
+  def _discard(self, connection):
+    try:
+      connection.close()
+    except sqlite3.Error:
+      pass
+    with self._lock:
+      self._open -= 1
+      self._stats['closed'] += 1
+
+  def close_all(self):
+    while True:
+      try:
+        connection, _ = self._idle.get_nowait()
+      except queue.Empty:
+        break
+      self._discard(connection)
+
+  # Retire the pool: close idle connections now and checked-out ones when
+  # they come back
+  def close(self):
+    self.closed = True
+    self.close_all()
+
+  # Undo close() for a pool that is still draining
+  def reopen(self):
+    self.closed = False
+
+  # Connections checked out right now
+  def in_use(self):
+    with self._lock:
+      return self._in_use
+
+  def stats(self):
+    with self._lock:
+      stats = dict(self._stats)
+      stats.update({
+        'size': self.size,
+        'open': self._open,
+        'in_use': self._in_use,
+        'idle': self._idle.qsize()
+      })
+    stats['wait_time_avg'] = stats['wait_time_total'] / stats['acquired'] if stats['acquired'] else 0.0
+    return stats
+
+# Methods whose requests only read. They get a connection from the read-only
+# pool; anything else, and work outside a request (invoke tasks), goes through
+# the single writer.
+READ_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+# Tables that hold a learner's own progress. With sharding on, each learner's
+# shard has its own copy of these (and their indexes and triggers); everything
+# else - the vocabulary - is read from the shared database attached as vocab.
+SHARD_TABLES = (
+  'study_sessions',
+  'word_review_items',
+  'word_reviews',
+  'word_mastery',
+  'daily_stats',
+  'review_submissions',
+  'word_schedules',
+  'table_versions'
+)
+
+# Vocabulary tables shards keep rows for: word_reviews per word and
+# word_schedules per group membership
+SHARD_VOCAB_TABLES = ('word_groups', 'words')
+
+LEARNER_ID = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
 
 class Db:
-  def __init__(self, database='words.db'):
+  def __init__(self, database='words.db', pool_size=5, pool_timeout=10.0, busy_timeout=5000,
+               cache_size=-20000, mmap_size=268435456, attach=None):
     self.database = database
-    self.connection = None
+    self.attach = attach
+    # Under WAL, readers see a consistent snapshot and never block the writer
+    # (or each other); the writer pool holds one connection, so mutations are
+    # serialized in-process instead of contending for the database lock.
+    self.readers = ConnectionPool(
+      database,
+      size=pool_size,
+      timeout=pool_timeout,
+      busy_timeout=busy_timeout,
+      cache_size=cache_size,
+      mmap_size=mmap_size,
+      read_only=True,
+      attach=attach
+    )
+    self.writer = ConnectionPool(
+      database,
+      size=1,
+      timeout=pool_timeout,
+      busy_timeout=busy_timeout,
+      cache_size=cache_size,
+      mmap_size=mmap_size,
+      attach=attach
+    )
+    self.pools = (self.readers, self.writer)
+    self.shards = None  # set by ShardRouter.init_app()
+    self.vocab_versions = None  # of a shard, set by ShardRouter.prepare()
+    self._wal_ready = False
+
+  # Read-only connections can neither create the database nor switch it to
+  # WAL, so the writer opens it once before the first reader does
+  def ensure_wal(self):
+    if not self._wal_ready:
+      self.writer.release(self.writer.acquire())
+      self._wal_ready = True
+
+  # The database of the given learner: their shard when sharding is on and
+  # they have one, otherwise this (shared) database
+  def for_learner(self, learner_id):
+    if self.shards is None or learner_id is None:
+      return self
+    return self.shards.get(learner_id)
+
+  # The database this request works on
+  def current(self):
+    return self.for_learner(g.get('learner_id'))
 
   def get(self):
     if 'db' not in g:
-      g.db = sqlite3.connect(self.database)
-      g.db.row_factory = sqlite3.Row  # Return rows as dictionaries
+      db = self.current()
+      if has_request_context() and request.method in READ_METHODS:
+        db.ensure_wal()
+        pool = db.readers
+      else:
+        pool = db.writer
+      g.db = pool.acquire()
+      g.db_pool = pool
     return g.db
 
+  # Serve the rest of this request from a reader connection, e.g. a POST that
+  # only validates and hands its writes to the review buffer
+  def use_readers(self):
+    if 'db' not in g:
+      db = self.current()
+      db.ensure_wal()
+      g.db = db.readers.acquire()
+      g.db_pool = db.readers
+
+  # Serve the rest of this request from the writer, e.g. a GET that claims rows
+  def use_writer(self):
+    if 'db' not in g:
+      db = self.current()
+      g.db = db.writer.acquire()
+      g.db_pool = db.writer
+
   def commit(self):
     self.get().commit()
 
+  def rollback(self):
+    self.get().rollback()
+
   def cursor(self):
     # Ensure the connection is valid before getting a cursor
     connection = self.get()
     return connection.cursor()
 
+  # Hand the request's connection back to the pool it came from
   def close(self):
     db = g.pop('db', None)
+    pool = g.pop('db_pool', None)
     if db is not None:
-      db.close()
+      pool.release(db)
+
+  def stats(self):
+    return {'readers': self.readers.stats(), 'writer': self.writer.stats()}
+
+  # [(name, version, updated_at)] for the given tables, or None when the
+  # database has no table_versions ledger yet
+  def table_versions(self, tables):
+    if self.current().attach:
+      # A shard versions its own tables; the vocabulary's live in the shared file
+      own = [table for table in tables if table in SHARD_TABLES]
+      shared = [table for table in tables if table not in SHARD_TABLES]
+      sql = f'''
+        SELECT name, version, updated_at FROM main.table_versions
+        WHERE name IN ({', '.join('?' * len(own))})
+        UNION ALL
+        SELECT name, version, updated_at FROM vocab.table_versions
+        WHERE name IN ({', '.join('?' * len(shared))})
+        ORDER BY name
+      '''
+      parameters = (*own, *shared)
+    else:
+      sql = f'''
+        SELECT name, version, updated_at FROM table_versions
+        WHERE name IN ({', '.join('?' * len(tables))})
+        ORDER BY name
+      '''
+      parameters = tuple(tables)
+    try:
+      cursor = self.cursor()
+      cursor.execute(sql, parameters)
+    except sqlite3.OperationalError:
+      return None
+    return [tuple(row) for row in cursor.fetchall()]
+
+  # Close every pooled connection (e.g. on shutdown)
+  def dispose(self):
+    for pool in self.pools:
+      pool.close_all()
+    if self.shards is not None:
+      self.shards.dispose()
 
   # Function to load SQL from a file
   def sql(self, filepath):
     with open('sql/' + filepath, 'r') as file:
       return file.read()
 
+  # Recompute a trigger-maintained table from scratch using sql/rebuild/<name>.sql,
+  # all in one transaction
+  def rebuild(self, name):
+    connection = self.get()
+    try:
+      connection.executescript('BEGIN;\n' + self.sql(f'rebuild/{name}.sql'))
+      connection.bump_versions([name])
+      connection.commit()
+    except sqlite3.Error:
+      if connection.in_transaction:
+        connection.rollback()
+      raise
+
+  # Groups whose words_count disagrees with word_groups, as
+  # [(id, name, words_count, actual)]; 'invoke rebuild --name groups' repairs them
+  def verify_words_count(self):
+    cursor = self.cursor()
+    cursor.execute('''
+      SELECT g.id, g.name, g.words_count, COUNT(wg.word_id) AS actual
+      FROM groups g
+      LEFT JOIN word_groups wg ON wg.group_id = g.id
+      GROUP BY g.id
+      HAVING g.words_count IS NOT COUNT(wg.word_id)
+      ORDER BY g.id
+    ''')
+    return [tuple(row) for row in cursor.fetchall()]
+
   # Function to load the words from a JSON file
   def load_json(self, filepath):
     with open(filepath, 'r') as file:
       return json.load(file)
 
+  # Yield the items of a top-level JSON array one at a time, reading the file in
+  # chunks so memory stays flat no matter how large the file is
+  def stream_json(self, filepath, chunk_size=1 << 16):
+    decoder = json.JSONDecoder()
+    with open(filepath, 'r', encoding='utf-8') as file:
+      buffer, pos, eof = '', 0, False
+
+      def skip(chars):
+        nonlocal pos
+        while pos < len(buffer) and buffer[pos] in chars:
+          pos += 1
+
+      def fill():
+        nonlocal buffer, pos, eof
+        chunk = file.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+      fill()
+      skip(' \t\r\n')
+      if buffer[pos:pos + 1] != '[':
+        raise ValueError(f"{filepath}: expected a JSON array")
+      pos += 1
+
+      while True:
+        skip(' \t\r\n,')
+        if pos == len(buffer):
+          if eof:
+            raise ValueError(f"{filepath}: unterminated JSON array")
+          fill()
+          continue
+        if buffer[pos] == ']':
+          return
+        try:
+          item, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+          if eof:
+            raise
+          fill()
+          continue
+        # A value that touches the end of the buffer may be cut short (e.g. a number)
+        if end == len(buffer) and not eof:
+          fill()
+          continue
+        pos = end
+        yield item
+
   def setup_tables(self,cursor):
     # Create the necessary tables
     cursor.execute(self.sql('setup/create_table_words.sql'))
@@ -67,47 +720,58 @@ class Db:
       ''', (activity['name'],activity['url'],activity['preview_url'],))
     self.get().commit()
 
-  def import_word_json(self,cursor,group_name,data_json_path):
+  # Import a (possibly huge) JSON array of words into a new group. The file is
+  # streamed and inserted in executemany batches, all inside one transaction.
+  def import_word_json(self, cursor, group_name, data_json_path, batch_size=5000, progress=None):
+    connection = self.get()
+    if connection.in_transaction:
+      connection.commit()
+    # Take the write lock up front: every word id above first_word_id is ours
+    cursor.execute('BEGIN IMMEDIATE')
+    try:
+      cursor.execute('SELECT COALESCE(MAX(id), 0) FROM words')
+      first_word_id = cursor.fetchone()[0]
+
       # Insert a new group
       cursor.execute('''
         INSERT INTO groups (name) VALUES (?)
       ''', (group_name,))
-      self.get().commit()
-
-      # Get the ID of the group
-      cursor.execute('SELECT id FROM groups WHERE name = ?', (group_name,))
-      core_verbs_group_id = cursor.fetchone()[0]
-
-      # Insert some sample words (verbs) from JSON file and associate with the group
-      words = self.load_json(data_json_path)
-
-      for word in words:
-        # Insert the word into the words table
-        cursor.execute('''
-          INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)
-        ''', (word['kanji'], word['romaji'], word['english'], json.dumps(word['parts'])))
-        
-        # Get the last inserted word's ID
-        word_id = cursor.lastrowid
-
-        # Insert the word-group relationship into word_groups table
-        cursor.execute('''
-          INSERT INTO word_groups (word_id, group_id) VALUES (?, ?)
-        ''', (word_id, core_verbs_group_id))
-      self.get().commit()
-
-      # Update the words_count in the groups table by counting all words in the group
+      group_id = cursor.lastrowid
+
+      imported = 0
+      batch = []
+      for word in self.stream_json(data_json_path):
+        batch.append((word['kanji'], word['romaji'], word['english'], json.dumps(word['parts'])))
+        if len(batch) >= batch_size:
+          imported += self._insert_words(cursor, batch)
+          batch = []
+          if progress:
+            progress(imported)
+      if batch:
+        imported += self._insert_words(cursor, batch)
+        if progress:
+          progress(imported)
+
+      # Associate every word inserted above with the group in one statement
       cursor.execute('''
-        UPDATE groups
-        SET words_count = (
-          SELECT COUNT(*) FROM word_groups WHERE group_id = ?
-        )
-        WHERE id = ?
-      ''', (core_verbs_group_id, core_verbs_group_id))
+        INSERT INTO word_groups (group_id, word_id)
+        SELECT ?, id FROM words WHERE id > ?
+      ''', (group_id, first_word_id))
+      # (groups.words_count is kept up to date by the word_groups triggers)
+
+      connection.commit()
+    except Exception:
+      connection.rollback()
+      raise
 
-      self.get().commit()
+    print(f"Successfully added {imported} words to the '{group_name}' group.")
+    return imported
 
-      print(f"Successfully added {len(words)} verbs to the '{group_name}' group.")
+  def _insert_words(self, cursor, batch):
+    cursor.executemany('''
+      INSERT INTO words (kanji, romaji, english, parts) VALUES (?, ?, ?, ?)
+    ''', batch)
+    return len(batch)
 
   # Initialize the database with sample data
   def init(self, app):
@@ -130,5 +794,203 @@ class Db:
         data_json_path='seed/study_activities.json'
       )
 
+# Routes each learner's requests to their own SQLite file (<directory>/<id>.db)
+# so writes from different learners don't queue on one database lock. The
+# learner is named by a request header; requests without it use the shared
+# database as before. Shards are opened on first use and the least recently
+# used ones are closed beyond max_open.
+#
+# - A shard is opened and prepared outside the router's lock, so a slow open
+#   only holds up requests for the same learner.
+# - An evicted shard keeps its checked-out connections until they are released.
+#   If its learner comes back before then, the same shard (and so the same
+#   single writer) is put back instead of opening a second one.
+# - Words and group memberships added to or removed from the shared database
+#   reach a shard at its learner's next request (see refresh()).
+class ShardRouter:
+  def __init__(self, db, directory='shards', max_open=64, pool_size=2, header='X-Learner-Id'):
+    self.db = db
+    self.directory = directory
+    self.max_open = max_open
+    self.pool_size = pool_size
+    self.header = header
+    self._shards = OrderedDict()
+    self._draining = {}  # evicted shards with connections still checked out
+    self._opening = {}  # learner id -> lock held while their shard is opened
+    self._lock = threading.Lock()
+    self._stats = {'opened': 0, 'evicted': 0, 'refreshed': 0}
+    os.makedirs(directory, exist_ok=True)
+
+  def init_app(self, app):
+    self.db.shards = self
+    app.before_request(self.before_request)
+    app.after_request(self.after_request)
+
+  def before_request(self):
+    learner_id = request.headers.get(self.header)
+    if learner_id is None:
+      return None
+    if not LEARNER_ID.match(learner_id):
+      return jsonify({"error": f"{self.header} must be 1-64 letters, digits, '-' or '_'"}), 400
+    g.learner_id = learner_id
+    # Before the request holds any connection of the shard
+    self.refresh(self.get(learner_id))
+
+  def after_request(self, response):
+    response.vary.add(self.header)
+    return response
+
+  def get(self, learner_id):
+    with self._lock:
+      shard = self._shards.get(learner_id)
+      if shard is not None:
+        self._shards.move_to_end(learner_id)
+        return shard
+      opening = self._opening.setdefault(learner_id, threading.Lock())
+
+    with opening:
+      with self._lock:
+        # Opened by another request while this one waited
+        shard = self._shards.get(learner_id)
+        if shard is not None:
+          self._shards.move_to_end(learner_id)
+          return shard
+        shard = self._draining.pop(learner_id, None)
+        if shard is not None:
+          for pool in shard.pools:
+            pool.reopen()
+          self._add(learner_id, shard)
+          return shard
+      try:
+        shard = self.open(learner_id)
+      except Exception:
+        with self._lock:
+          self._opening.pop(learner_id, None)
+        raise
+      with self._lock:
+        self._opening.pop(learner_id, None)
+        self._stats['opened'] += 1
+        self._add(learner_id, shard)
+      return shard
+
+  # Make the shard the most recently used one and evict beyond max_open
+  # (called with the lock held)
+  def _add(self, learner_id, shard):
+    self._shards[learner_id] = shard
+    while len(self._shards) > self.max_open:
+      evicted_id, evicted = self._shards.popitem(last=False)
+      for pool in evicted.pools:
+        pool.close()
+      self._draining[evicted_id] = evicted
+      self._stats['evicted'] += 1
+    # Forget evicted shards whose last connection has come back
+    for evicted_id, evicted in list(self._draining.items()):
+      if not any(pool.in_use() for pool in evicted.pools):
+        del self._draining[evicted_id]
+
+  def open(self, learner_id):
+    writer = self.db.writer
+    shard = Db(
+      database=os.path.join(self.directory, f'{learner_id}.db'),
+      pool_size=self.pool_size,
+      pool_timeout=writer.timeout,
+      busy_timeout=writer.busy_timeout,
+      cache_size=writer.cache_size,
+      mmap_size=writer.mmap_size,
+      attach={'vocab': self.db.database}
+    )
+    for pool in shard.pools:
+      pool.profiler = writer.profiler
+    self.prepare(shard)
+    return shard
+
+  # Write versions of SHARD_VOCAB_TABLES in the shared database
+  def vocab_versions(self, cursor):
+    try:
+      cursor.execute('''
+        SELECT name, version FROM vocab.table_versions
+        WHERE name IN (?, ?)
+        ORDER BY name
+      ''', SHARD_VOCAB_TABLES)
+    except sqlite3.OperationalError:
+      return None  # no table_versions ledger yet
+    return [tuple(row) for row in cursor.fetchall()]
+
+  # Prepare the shard again if words or group memberships changed in the shared
+  # database since it was last prepared
+  def refresh(self, shard):
+    connection = shard.readers.acquire()
+    try:
+      versions = self.vocab_versions(connection.cursor())
+    finally:
+      shard.readers.release(connection)
+    if versions is not None and versions == shard.vocab_versions:
+      return
+    self.prepare(shard)
+    with self._lock:
+      self._stats['refreshed'] += 1
+
+  # Bring the shard's schema up to date with the shared database's learner
+  # tables (new shards get all of it), give new words their zeroed counter row
+  # and schedule newly grouped words; counters of deleted words and schedules of
+  # removed memberships go. Column changes to existing tables are not carried
+  # over.
+  def prepare(self, shard):
+    connection = shard.writer.acquire()
+    try:
+      cursor = connection.cursor()
+      # Read first: a change made during the top-up triggers another one
+      versions = self.vocab_versions(cursor)
+      placeholders = ', '.join('?' * len(SHARD_TABLES))
+      cursor.execute(f'''
+        SELECT sql FROM vocab.sqlite_master
+        WHERE tbl_name IN ({placeholders}) AND sql IS NOT NULL
+          AND name NOT IN (SELECT name FROM main.sqlite_master)
+        ORDER BY CASE type WHEN 'table' THEN 0 WHEN 'index' THEN 1 ELSE 2 END
+      ''', SHARD_TABLES)
+      for (sql,) in cursor.fetchall():
+        cursor.execute(sql)
+      cursor.execute('INSERT OR IGNORE INTO word_mastery (id) VALUES (1)')
+      cursor.execute('''
+        INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+        SELECT id, 0, 0, NULL FROM vocab.words WHERE true
+        ON CONFLICT (word_id) DO NOTHING
+      ''')
+      cursor.execute('''
+        INSERT INTO word_schedules (group_id, word_id)
+        SELECT group_id, word_id FROM vocab.word_groups WHERE true
+        ON CONFLICT (group_id, word_id) DO NOTHING
+      ''')
+      cursor.execute('DELETE FROM word_reviews WHERE word_id NOT IN (SELECT id FROM vocab.words)')
+      cursor.execute('''
+        DELETE FROM word_schedules
+        WHERE NOT EXISTS (
+          SELECT 1 FROM vocab.word_groups wg
+          WHERE wg.group_id = word_schedules.group_id AND wg.word_id = word_schedules.word_id
+        )
+      ''')
+      connection.commit()
+    except Exception:
+      connection.rollback()
+      raise
+    finally:
+      shard.writer.release(connection)
+    shard.vocab_versions = versions
+    shard._wal_ready = True
+
+  def dispose(self):
+    with self._lock:
+      for shard in [*self._shards.values(), *self._draining.values()]:
+        for pool in shard.pools:
+          pool.close()
+      self._shards.clear()
+      self._draining.clear()
+
+  def stats(self):
+    with self._lock:
+      stats = dict(self._stats)
+      stats.update({'open': len(self._shards), 'draining': len(self._draining), 'max_open': self.max_open})
+    return stats
+
 # Create an instance of the Db class
 db = Db()
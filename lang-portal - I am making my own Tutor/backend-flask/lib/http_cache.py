@@ -0,0 +1,94 @@
+import functools
+import hashlib
+from datetime import datetime, timezone
+
+from flask import current_app, g, make_response, request
+
+from lib.compression import encoded_etags
+from lib.serialization import wants_msgpack
+
+# Latest updated_at of the given table_versions rows, truncated to the whole
+# second HTTP dates can carry
+def modified_at(versions):
+  updated = [updated_at for _, _, updated_at in versions if updated_at]
+  if not updated:
+    return None
+  latest = datetime.strptime(max(updated)[:19], '%Y-%m-%d %H:%M:%S')
+  return latest.replace(tzinfo=timezone.utc)
+
+# Conditional GET support. A route decorated with @conditional('words', ...) gets
+# a strong ETag derived from the write versions of the tables it reads (see
+# table_versions / lib/db.py). A matching If-None-Match is answered with 304
+# before the view - and its SQL - runs.
+#
+# per_day=True is for views whose output also depends on the current date
+# (e.g. streaks and "last 30 days" counts).
+#
+# last_modified=True also sends Last-Modified (the latest write to any of the
+# tables) and honours If-Modified-Since from clients that send no ETag. Pass a
+# tuple of tables instead to date the response by those.
+#
+# signature is for views that read a small part of a busy table (e.g. one
+# group's rows of word_groups): a function of the view's arguments whose result
+# goes into the ETag in place of that table's version, so writes elsewhere in
+# it keep the ETag.
+#
+# json_only=True is for views that always answer JSON, so MessagePack clients
+# get the same ETag.
+#
+# cache=True keeps the finished body in app.result_cache under the ETag (see
+# lib/result_cache.py), so callers without a matching ETag don't recompute it.
+def conditional(*tables, per_day=False, last_modified=False, cache=False,
+                signature=None, json_only=False):
+  dated = last_modified if isinstance(last_modified, tuple) else tables
+  def decorator(view):
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+      versions = current_app.db.table_versions(sorted({*tables, *dated}))
+      if versions is None:
+        return view(*args, **kwargs)
+
+      key = [request.full_path, [version for version in versions if version[0] in tables]]
+      if signature:
+        key.append(signature(*args, **kwargs))
+      # Learners with their own shard have their own versions of the same tables
+      if g.get('learner_id'):
+        key.append(g.learner_id)
+      # JSON and MessagePack bodies are different representations
+      if not json_only and wants_msgpack():
+        key.append('msgpack')
+      if per_day:
+        key.append(datetime.now(timezone.utc).date().isoformat())
+      etag = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+      modified = None
+      if last_modified:
+        modified = modified_at([version for version in versions if version[0] in dated])
+
+      if any(tag in request.if_none_match for tag in [etag, *encoded_etags(etag)]):
+        response = current_app.response_class(status=304)
+      elif (modified and not request.if_none_match and request.if_modified_since
+            and modified <= request.if_modified_since):
+        response = current_app.response_class(status=304)
+      else:
+        result_cache = getattr(current_app, 'result_cache', None) if cache else None
+        cached = result_cache.get(etag) if result_cache is not None else None
+        if cached is not None:
+          headers, body = cached
+          response = current_app.response_class(body, headers=headers)
+          response.headers['X-Cache'] = 'HIT'
+        else:
+          response = make_response(view(*args, **kwargs))
+          if response.status_code != 200:
+            return response
+          if result_cache is not None and not response.is_streamed:
+            result_cache.set(etag, list(response.headers.items()), response.get_data())
+            response.headers['X-Cache'] = 'MISS'
+
+      response.set_etag(etag)
+      if modified:
+        response.last_modified = modified
+      # Let clients keep the body but always revalidate it
+      response.headers['Cache-Control'] = 'no-cache'
+      return response
+    return wrapper
+  return decorator
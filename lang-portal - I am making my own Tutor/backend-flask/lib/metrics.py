@@ -0,0 +1,234 @@
+import bisect
+import threading
+import time
+from flask import g, request
+
+# Prometheus text exposition (format 0.0.4) without the prometheus_client
+# dependency. Metrics.init_app() times every request, picks up the per-request
+# SQL records kept by lib.db.SqlProfiler and reads the connection pool's
+# counters at scrape time.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+ROWS_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, 5000, 10000)
+QUERIES_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+def format_labels(names, values):
+  if not names:
+    return ''
+  pairs = []
+  for name, value in zip(names, values):
+    value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    pairs.append(f'{name}="{value}"')
+  return '{' + ','.join(pairs) + '}'
+
+def format_value(value):
+  if value == float('inf'):
+    return '+Inf'
+  if isinstance(value, float) and value.is_integer():
+    return str(int(value))
+  return repr(value) if isinstance(value, float) else str(value)
+
+class Counter:
+  kind = 'counter'
+
+  def __init__(self, name, help, labels=()):
+    self.name = name
+    self.help = help
+    self.labels = tuple(labels)
+    self._values = {}
+    self._lock = threading.Lock()
+
+  def inc(self, *label_values, amount=1):
+    with self._lock:
+      self._values[label_values] = self._values.get(label_values, 0) + amount
+
+  def samples(self):
+    with self._lock:
+      values = sorted(self._values.items())
+    for label_values, value in values:
+      yield self.name, format_labels(self.labels, label_values), value
+
+class Histogram:
+  kind = 'histogram'
+
+  def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+    self.name = name
+    self.help = help
+    self.labels = tuple(labels)
+    self.buckets = tuple(buckets)
+    self._values = {}  # label values -> [bucket counts..., +Inf count, sum]
+    self._lock = threading.Lock()
+
+  def observe(self, value, *label_values):
+    # Counts are stored per bucket and made cumulative at scrape time
+    index = bisect.bisect_left(self.buckets, value)
+    with self._lock:
+      state = self._values.get(label_values)
+      if state is None:
+        state = self._values[label_values] = [0] * (len(self.buckets) + 1) + [0.0]
+      state[index] += 1
+      state[-1] += value
+
+  def samples(self):
+    with self._lock:
+      values = sorted((label_values, list(state)) for label_values, state in self._values.items())
+    for label_values, state in values:
+      cumulative = 0
+      for bound, count in zip(self.buckets + (float('inf'),), state[:-1]):
+        cumulative += count
+        yield (
+          self.name + '_bucket',
+          format_labels(self.labels + ('le',), label_values + (format_value(float(bound)),)),
+          cumulative
+        )
+      labels = format_labels(self.labels, label_values)
+      yield self.name + '_sum', labels, state[-1]
+      yield self.name + '_count', labels, cumulative
+
+# Read at scrape time from a callback returning {label values: value}. Also
+# used for counters that are kept elsewhere (kind='counter').
+class Gauge:
+  def __init__(self, name, help, collect, labels=(), kind='gauge'):
+    self.kind = kind
+    self.name = name
+    self.help = help
+    self.labels = tuple(labels)
+    self.collect = collect
+
+  def samples(self):
+    for label_values, value in sorted(self.collect().items()):
+      yield self.name, format_labels(self.labels, label_values), value
+
+class Metrics:
+  def __init__(self, prefix='lang_portal'):
+    self.prefix = prefix
+    self.metrics = []
+
+  def counter(self, name, help, labels=()):
+    return self.register(Counter(f'{self.prefix}_{name}', help, labels))
+
+  def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+    return self.register(Histogram(f'{self.prefix}_{name}', help, labels, buckets))
+
+  def gauge(self, name, help, collect, labels=(), kind='gauge'):
+    return self.register(Gauge(f'{self.prefix}_{name}', help, collect, labels, kind))
+
+  def register(self, metric):
+    self.metrics.append(metric)
+    return metric
+
+  def init_app(self, app):
+    from lib.db import SqlProfiler
+
+    # SQL time and rows come from the profiler's per-request records. Without
+    # SQL_PROFILE it is installed in record-only mode: no log, no headers.
+    if app.db.writer.profiler is None:
+      SqlProfiler(slow_query_ms=None, log_path=None, header=False).init_app(app)
+
+    self.requests = self.counter(
+      'http_requests_total', 'HTTP requests by endpoint, method and status code',
+      ('endpoint', 'method', 'status')
+    )
+    self.latency = self.histogram(
+      'http_request_duration_seconds', 'Time spent in the view, per endpoint',
+      ('endpoint', 'method')
+    )
+    self.sql_time = self.histogram(
+      'sql_time_per_request_seconds', 'Time spent executing SQL and fetching rows, per request',
+      ('endpoint',)
+    )
+    self.sql_queries = self.histogram(
+      'sql_queries_per_request', 'Statements executed per request',
+      ('endpoint',), QUERIES_BUCKETS
+    )
+    self.sql_rows = self.histogram(
+      'sql_rows_per_request', 'Rows fetched or written by SQL per request',
+      ('endpoint',), ROWS_BUCKETS
+    )
+
+    pools = {'readers': app.db.readers, 'writer': app.db.writer}
+    pool_stat = lambda key: lambda: {(name,): pool.stats()[key] for name, pool in pools.items()}
+    for name, key, help, kind in (
+      ('db_connections_opened_total', 'opened', 'SQLite connections opened by the pool', 'counter'),
+      ('db_connections_closed_total', 'closed', 'SQLite connections closed by the pool', 'counter'),
+      ('db_pool_acquired_total', 'acquired', 'Connections checked out of the pool', 'counter'),
+      ('db_pool_waits_total', 'waits', 'Checkouts that had to wait for a free connection', 'counter'),
+      ('db_pool_timeouts_total', 'timeouts', 'Checkouts that gave up waiting', 'counter'),
+      ('db_pool_wait_seconds_total', 'wait_time_total', 'Time spent waiting for a connection', 'counter'),
+      ('db_pool_size', 'size', 'Maximum number of pooled connections', 'gauge'),
+      ('db_pool_open_connections', 'open', 'Connections currently open', 'gauge'),
+      ('db_pool_in_use_connections', 'in_use', 'Connections currently checked out', 'gauge'),
+      ('db_pool_idle_connections', 'idle', 'Connections idle in the pool', 'gauge')
+    ):
+      self.gauge(name, help, pool_stat(key), labels=('pool',), kind=kind)
+
+    if app.db.shards is not None:
+      shard_stat = lambda key: lambda: {(): app.db.shards.stats()[key]}
+      for name, key, help, kind in (
+        ('db_shards_opened_total', 'opened', 'Learner shards opened', 'counter'),
+        ('db_shards_evicted_total', 'evicted', 'Learner shards closed to stay under the open limit', 'counter'),
+        ('db_shards_refreshed_total', 'refreshed', 'Open learner shards caught up with vocabulary changes', 'counter'),
+        ('db_shards_draining', 'draining', 'Evicted learner shards with connections still checked out', 'gauge'),
+        ('db_shards_open', 'open', 'Learner shards currently open', 'gauge')
+      ):
+        self.gauge(name, help, shard_stat(key), kind=kind)
+
+    result_cache = getattr(app, 'result_cache', None)
+    if result_cache is not None:
+      cache_stat = lambda key: lambda: {(): result_cache.stats()[key]}
+      self.gauge(
+        'result_cache_lookups_total', 'Result cache lookups by outcome',
+        lambda: {(outcome,): result_cache.stats()[key]
+                 for outcome, key in (('memory_hit', 'hits'), ('disk_hit', 'disk_hits'), ('miss', 'misses'))},
+        labels=('result',), kind='counter'
+      )
+      for name, key, help, kind in (
+        ('result_cache_evictions_total', 'evictions', 'Entries dropped from the in-memory LRU', 'counter'),
+        ('result_cache_entries', 'entries', 'Entries held in memory', 'gauge'),
+        ('result_cache_hit_ratio', 'hit_ratio', 'Share of lookups answered from the cache', 'gauge')
+      ):
+        self.gauge(name, help, cache_stat(key), kind=kind)
+
+    buffer = getattr(app, 'review_buffer', None)
+    if buffer is not None:
+      buffer_stat = lambda key: lambda: {(): buffer.stats()[key]}
+      for name, key, help, kind in (
+        ('review_buffer_submissions_total', 'submissions', 'Review submissions queued for write-behind', 'counter'),
+        ('review_buffer_rows_flushed_total', 'rows_flushed', 'Review rows written by the flush thread', 'counter'),
+        ('review_buffer_flushes_total', 'flushes', 'Batched flush transactions', 'counter'),
+        ('review_buffer_rejected_total', 'rejected', 'Submissions refused because the buffer was full or their key belonged to another session', 'counter'),
+        ('review_buffer_failed_total', 'failed', 'Submissions dropped after a failed write', 'counter'),
+        ('review_buffer_retried_total', 'retried', 'Submissions requeued after a failed write', 'counter'),
+        ('review_buffer_pending_rows', 'pending_rows', 'Review rows waiting to be flushed', 'gauge'),
+        ('review_buffer_capacity_rows', 'capacity', 'Review rows the buffer holds before pushing back', 'gauge')
+      ):
+        self.gauge(name, help, buffer_stat(key), kind=kind)
+
+    app.before_request(self.before_request)
+    app.after_request(self.after_request)
+
+  def before_request(self):
+    g.metrics_started = time.perf_counter()
+
+  def after_request(self, response):
+    started = g.pop('metrics_started', None)
+    if started is None:
+      return response
+    endpoint = request.endpoint or 'unmatched'
+    entries = g.get('sql_profile', [])
+
+    self.requests.inc(endpoint, request.method, response.status_code)
+    self.latency.observe(time.perf_counter() - started, endpoint, request.method)
+    self.sql_time.observe(sum(entry['duration_ms'] for entry in entries) / 1000, endpoint)
+    self.sql_queries.observe(len(entries), endpoint)
+    self.sql_rows.observe(sum(entry['rows'] for entry in entries), endpoint)
+    return response
+
+  def render(self):
+    lines = []
+    for metric in self.metrics:
+      lines.append(f'# HELP {metric.name} {metric.help}')
+      lines.append(f'# TYPE {metric.name} {metric.kind}')
+      for name, labels, value in metric.samples():
+        lines.append(f'{name}{labels} {format_value(value)}')
+    return '\n'.join(lines) + '\n'
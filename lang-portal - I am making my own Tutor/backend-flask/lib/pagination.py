@@ -0,0 +1,41 @@
+import base64
+import json
+
+class InvalidCursor(ValueError):
+  pass
+
+# Cursors are opaque to clients: a urlsafe base64 JSON array of
+# [sort_by, order, sort_value, id] taken from the last row of a page
+def encode_cursor(sort_by, order, sort_value, row_id):
+  payload = json.dumps([sort_by, order, sort_value, row_id], separators=(',', ':'))
+  return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+# Returns (sort_value, id) to seek past, or None for the first page (empty cursor)
+def decode_cursor(cursor, sort_by, order):
+  if not cursor:
+    return None
+  try:
+    padded = cursor + '=' * (-len(cursor) % 4)
+    cursor_sort_by, cursor_order, sort_value, row_id = json.loads(base64.urlsafe_b64decode(padded))
+  except (ValueError, TypeError):
+    raise InvalidCursor('Malformed cursor')
+  if cursor_sort_by != sort_by or cursor_order != order:
+    raise InvalidCursor('Cursor was issued for a different sort_by/order')
+  return sort_value, row_id
+
+# Row-value comparison so rows sharing a sort value are ordered (and skipped) by id.
+# SQLite turns it into an index range on the sort column.
+def seek_clause(sort_expression, id_expression, order):
+  operator = '>' if order == 'asc' else '<'
+  return f'({sort_expression}, {id_expression}) {operator} (?, ?)'
+
+# Pages are fetched with LIMIT per_page + 1; the extra row only tells us whether
+# there is a next page. Rows must expose the sort value as 'sort_key'.
+def keyset_page(rows, per_page, sort_by, order, id_key='id'):
+  if per_page < 1:
+    raise ValueError('per_page must be at least 1')
+  if len(rows) <= per_page:
+    return rows, None
+  rows = rows[:per_page]
+  last = rows[-1]
+  return rows, encode_cursor(sort_by, order, last['sort_key'], last[id_key])
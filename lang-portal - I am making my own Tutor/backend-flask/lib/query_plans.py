@@ -0,0 +1,117 @@
+import os
+import re
+import sqlite3
+import tempfile
+
+# Tables that grow with study history. A full scan of any of these in a
+# route's SQL is treated as a failure.
+HOT_TABLES = {'word_review_items', 'study_sessions', 'word_groups', 'word_reviews', 'word_schedules', 'words'}
+
+# Endpoints that page through a whole hot table in a client-chosen order. Their
+# pages must come straight off an index: a temp B-tree sort is a failure too.
+INDEX_ORDERED_ENDPOINTS = {'get_words'}
+
+# Extra query strings to request per endpoint so that every SQL variant
+# (e.g. each allowed sort column) gets planned
+ROUTE_VARIANTS = {
+  'get_words': [f'sort_by={column}&order={order}'
+                for column in ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']
+                for order in ['asc', 'desc']] + ['ids=1,2,3'],
+  'get_groups': [f'sort_by={column}' for column in ['name', 'words_count']],
+  'search_words': ['q=to&limit=5', 'q=ike&mode=substring'],
+  'get_group_words': [f'sort_by={column}'
+                      for column in ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count']],
+  'get_group_study_sessions': [f'sort_by={column}'
+                               for column in ['startTime', 'endTime', 'activityName', 'groupName', 'reviewItemsCount']]
+}
+
+TABLE_REFERENCE = re.compile(r'\b(?:FROM|JOIN)\s+([A-Za-z_]\w*)(?:\s+(?:AS\s+)?([A-Za-z_]\w*))?', re.IGNORECASE)
+SCAN = re.compile(r'^SCAN (\w+)(.*)$')
+SQL_KEYWORDS = {'where', 'join', 'left', 'inner', 'cross', 'on', 'group', 'order', 'limit', 'having', 'union', 'using'}
+
+def table_aliases(sql):
+  aliases = {}
+  for table, alias in TABLE_REFERENCE.findall(sql):
+    aliases[table] = table
+    if alias and alias.lower() not in SQL_KEYWORDS:
+      aliases[alias] = table
+  return aliases
+
+# Return the plan lines of a statement that scan a hot table without an index
+# (or, with ordered=True, sort its rows instead of reading them in order)
+def scans(connection, sql, ordered=False):
+  aliases = table_aliases(sql)
+  problems = []
+  for row in connection.execute('EXPLAIN QUERY PLAN ' + sql):
+    detail = row[3]
+    if ordered and 'TEMP B-TREE FOR ORDER BY' in detail:
+      problems.append(detail)
+      continue
+    if 'AUTOMATIC' in detail:
+      problems.append(detail)
+      continue
+    match = SCAN.match(detail)
+    if not match:
+      continue
+    table = aliases.get(match.group(1), match.group(1))
+    if table in HOT_TABLES and 'INDEX' not in match.group(2):
+      problems.append(detail)
+  return problems
+
+def seed_history(app):
+  with app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute('INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1)')
+    session_id = cursor.lastrowid
+    cursor.executemany(
+      'INSERT INTO word_review_items (word_id, study_session_id, correct) VALUES (?, ?, ?)',
+      [(word_id, session_id, word_id % 3 != 0) for word_id in range(1, 11)]
+    )
+    app.db.commit()
+
+# Request every GET route against a scratch database, collect the SQL it runs
+# and EXPLAIN it. Returns {sql: [problem plan lines]} for offending statements.
+def check_query_plans(create_app, run_migrations):
+  database = os.path.join(tempfile.mkdtemp(), 'query_plans.db')
+  app = create_app({'DATABASE': database, 'TESTING': True})
+  app.db.init(app)
+  run_migrations(db_path=database)
+  seed_history(app)
+
+  statements = []
+  current = {'endpoint': None}
+  def traced(connect):
+    def traced_connect():
+      connection = connect()
+      connection.set_trace_callback(lambda sql: statements.append((current['endpoint'], sql)))
+      return connection
+    return traced_connect
+  for pool in app.db.pools:
+    pool.connect = traced(pool.connect)
+  app.db.dispose()
+
+  client = app.test_client()
+  for rule in app.url_map.iter_rules():
+    if 'GET' not in rule.methods or rule.endpoint == 'static':
+      continue
+    path = rule.build({argument: 1 for argument in rule.arguments}, append_unknown=False)[1]
+    current['endpoint'] = rule.endpoint
+    for query in [''] + ROUTE_VARIANTS.get(rule.endpoint, []):
+      client.get(path + ('?' + query if query else ''))
+      # Keyset mode: first page, then one seek page if there is one
+      response = client.get(path + '?' + '&'.join(filter(None, [query, 'cursor='])))
+      body = response.get_json(silent=True)
+      next_cursor = body.get('next_cursor') if isinstance(body, dict) else None
+      if next_cursor:
+        client.get(path + '?' + '&'.join(filter(None, [query, 'cursor=' + next_cursor])))
+
+  connection = sqlite3.connect(database)
+  failures = {}
+  for endpoint, sql in dict.fromkeys(statements):
+    if not sql.lstrip().upper().startswith(('SELECT', 'WITH')):
+      continue
+    problems = scans(connection, sql, ordered=endpoint in INDEX_ORDERED_ENDPOINTS)
+    if problems:
+      failures[sql] = problems
+  connection.close()
+  return failures
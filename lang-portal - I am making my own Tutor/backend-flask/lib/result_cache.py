@@ -0,0 +1,125 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# Server-side cache of finished response bodies for routes decorated with
+# @conditional(..., cache=True). Entries are keyed by the route's ETag, which
+# already covers the path and query string, the write versions of the tables
+# the route reads, the learner and the response format. A commit that bumps one
+# of those versions therefore changes the key: stale entries are never served,
+# they just age out of the LRU (or hit their TTL).
+#
+# The memory tier is an LRU of max_entries with a ttl in seconds. With disk_path
+# set, entries are also written to a small SQLite file shared by every process
+# of the app, which is consulted on a memory miss.
+class ResultCache:
+  def __init__(self, max_entries=256, ttl=300, disk_path=None, max_disk_entries=10000):
+    self.max_entries = max_entries
+    self.ttl = ttl
+    self.disk_path = disk_path
+    self.max_disk_entries = max_disk_entries
+
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    self._stats = {'hits': 0, 'disk_hits': 0, 'misses': 0, 'stores': 0, 'evictions': 0}
+    self._disk = None
+    self._disk_writes = 0
+    if disk_path:
+      os.makedirs(os.path.dirname(disk_path) or '.', exist_ok=True)
+      self._disk = sqlite3.connect(disk_path, check_same_thread=False, isolation_level=None)
+      self._disk.execute('PRAGMA journal_mode=WAL')
+      self._disk.execute('PRAGMA synchronous=OFF')  # losing the cache loses nothing
+      self._disk.execute('''
+        CREATE TABLE IF NOT EXISTS results (
+          key TEXT PRIMARY KEY,
+          headers TEXT NOT NULL,
+          body BLOB NOT NULL,
+          expires_at REAL NOT NULL
+        )
+      ''')
+      self._disk.execute('CREATE INDEX IF NOT EXISTS idx_results_expires_at ON results (expires_at)')
+      self._disk_lock = threading.Lock()
+
+  def init_app(self, app):
+    app.result_cache = self
+
+  # (headers, body) for the key, or None
+  def get(self, key):
+    now = time.monotonic()
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        headers, body, expires_at = entry
+        if expires_at > now:
+          self._entries.move_to_end(key)
+          self._stats['hits'] += 1
+          return headers, body
+        del self._entries[key]
+
+    if self._disk is not None:
+      with self._disk_lock:
+        row = self._disk.execute(
+          'SELECT headers, body, expires_at FROM results WHERE key = ? AND expires_at > ?',
+          (key, time.time())
+        ).fetchone()
+      if row is not None:
+        headers, body = json.loads(row[0]), bytes(row[1])
+        # Disk entries expire on the wall clock; the memory copy keeps what is left
+        self._remember(key, headers, body, now + row[2] - time.time())
+        with self._lock:
+          self._stats['disk_hits'] += 1
+        return headers, body
+
+    with self._lock:
+      self._stats['misses'] += 1
+    return None
+
+  def set(self, key, headers, body):
+    self._remember(key, headers, body, time.monotonic() + self.ttl)
+    with self._lock:
+      self._stats['stores'] += 1
+    if self._disk is not None:
+      with self._disk_lock:
+        self._disk.execute(
+          'INSERT OR REPLACE INTO results (key, headers, body, expires_at) VALUES (?, ?, ?, ?)',
+          (key, json.dumps(headers), body, time.time() + self.ttl)
+        )
+        self._disk_writes += 1
+        if self._disk_writes % 100 == 0:
+          self._prune_disk()
+
+  def _remember(self, key, headers, body, expires_at):
+    with self._lock:
+      self._entries[key] = (headers, body, expires_at)
+      self._entries.move_to_end(key)
+      while len(self._entries) > self.max_entries:
+        self._entries.popitem(last=False)
+        self._stats['evictions'] += 1
+
+  # Drop expired disk entries, then the ones closest to expiry beyond the limit
+  # (called with the disk lock held)
+  def _prune_disk(self):
+    self._disk.execute('DELETE FROM results WHERE expires_at <= ?', (time.time(),))
+    self._disk.execute('''
+      DELETE FROM results WHERE key IN (
+        SELECT key FROM results ORDER BY expires_at DESC LIMIT -1 OFFSET ?
+      )
+    ''', (self.max_disk_entries,))
+
+  def clear(self):
+    with self._lock:
+      self._entries.clear()
+    if self._disk is not None:
+      with self._disk_lock:
+        self._disk.execute('DELETE FROM results')
+
+  def stats(self):
+    with self._lock:
+      stats = dict(self._stats)
+      stats['entries'] = len(self._entries)
+    lookups = stats['hits'] + stats['disk_hits'] + stats['misses']
+    stats['hit_ratio'] = (stats['hits'] + stats['disk_hits']) / lookups if lookups else 0.0
+    return stats
@@ -0,0 +1,337 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import weakref
+
+logger = logging.getLogger('lang_portal.review_buffer')
+
+class BufferFull(Exception):
+  pass
+
+# Failures caused by the submission itself; retrying it would fail again
+PERMANENT_ERRORS = (sqlite3.IntegrityError, sqlite3.DataError, KeyError, TypeError, ValueError)
+
+# Write-behind queue for review submissions. Requests enqueue validated
+# submissions and return; a background thread writes whatever has piled up in
+# one transaction every interval_ms, or as soon as max_rows reviews are waiting.
+#
+# - Memory is bounded by capacity (review rows). When it is full, put() waits up
+#   to put_timeout seconds for a flush to make room and then raises BufferFull,
+#   which the route turns into 503 + Retry-After.
+# - Every submission is recorded in review_submissions in the same transaction
+#   as its reviews (under a generated key when the client sent none), so writing
+#   a submission twice is a no-op.
+# - With journal_path set, put() appends the submission to a journal and fsyncs
+#   it before returning. Whatever is in the journal at startup is replayed, so
+#   acknowledged reviews survive a crash; the key check above makes the replay
+#   idempotent. The journal is emptied whenever a flush leaves nothing queued,
+#   and otherwise rewritten to what is still queued every compact_every flushes.
+# - A submission whose idempotency key was already used for another study
+#   session is dropped, logged and counted as rejected, like the direct path's 409.
+# - A submission the database rejects (PERMANENT_ERRORS) is dropped and logged.
+#   Any other failure, such as a PoolTimeout, puts the batch back at the front
+#   of the queue, and the flush thread retries with exponential backoff (up to
+#   max_backoff seconds) while it keeps running.
+#
+# init_app() closes the buffer along with the app; a buffer used without an app
+# must be closed by its owner.
+class ReviewBuffer:
+  def __init__(self, db, max_rows=500, interval_ms=50, capacity=10000, put_timeout=1.0, journal_path=None,
+               max_backoff=5.0, compact_every=100):
+    self.db = db
+    self.max_rows = max_rows
+    self.interval = interval_ms / 1000
+    self.capacity = capacity
+    self.put_timeout = put_timeout
+    self.journal_path = journal_path
+    self.max_backoff = max_backoff
+    self.compact_every = compact_every
+
+    self._pending = []
+    self._pending_rows = 0
+    self._flushing_rows = 0
+    self._pending_keys = {}
+    self._oldest = None
+    self._backoff = 0
+    self._retry_at = None
+    self._condition = threading.Condition()
+    self._closed = False
+    self._journal = None
+    self._uncompacted_flushes = 0
+    self._stats = {
+      'submissions': 0,
+      'rows_flushed': 0,
+      'flushes': 0,
+      'rejected': 0,
+      'failed': 0,
+      'retried': 0,
+      'replayed': 0
+    }
+
+    if journal_path:
+      os.makedirs(os.path.dirname(journal_path) or '.', exist_ok=True)
+      self._replay_journal()
+      self._journal = open(journal_path, 'a', encoding='utf-8')
+
+    self._thread = threading.Thread(target=self._run, name='review-buffer', daemon=True)
+    self._thread.start()
+
+  def init_app(self, app):
+    app.review_buffer = self
+    # Flush and stop when the app is garbage collected or the process exits
+    weakref.finalize(app, self.close)
+
+  # The study session of the learner's queued submission with this
+  # idempotency key, if any
+  def pending(self, key, learner_id=None):
+    with self._condition:
+      return self._pending_keys.get((learner_id, key))
+
+  # learner_id picks the learner's shard (see ShardRouter in lib/db.py)
+  def put(self, study_session_id, reviews, idempotency_key=None, end_session=False, learner_id=None):
+    submission = {
+      'learner_id': learner_id,
+      'key': idempotency_key or f'buffer:{uuid.uuid4()}',
+      'study_session_id': study_session_id,
+      'reviews': [[review['word_id'], review['is_correct']] for review in reviews],
+      'end_session': end_session
+    }
+    size = len(submission['reviews'])
+    deadline = time.monotonic() + self.put_timeout
+    with self._condition:
+      # Backpressure: wait for the flusher to make room (an oversized
+      # submission is let through once the buffer is empty)
+      while self._buffered_rows() and self._buffered_rows() + size > self.capacity:
+        remaining = deadline - time.monotonic()
+        if self._closed or remaining <= 0:
+          self._stats['rejected'] += 1
+          raise BufferFull('Review buffer is full')
+        self._condition.wait(remaining)
+      if self._closed:
+        raise BufferFull('Review buffer is closed')
+      if self._journal:
+        self._journal.write(json.dumps(submission) + '\n')
+        self._journal.flush()
+        os.fsync(self._journal.fileno())
+      self._enqueue(submission)
+      self._condition.notify_all()
+    return submission['key']
+
+  # Rows held in memory: queued plus the batch being written
+  def _buffered_rows(self):
+    return self._pending_rows + self._flushing_rows
+
+  def _enqueue(self, submission):
+    if not self._pending:
+      self._oldest = time.monotonic()
+    self._pending.append(submission)
+    self._pending_rows += len(submission['reviews'])
+    self._pending_keys[(submission.get('learner_id'), submission['key'])] = submission['study_session_id']
+    self._stats['submissions'] += 1
+
+  def _replay_journal(self):
+    if not os.path.exists(self.journal_path):
+      return
+    with open(self.journal_path, encoding='utf-8') as journal:
+      for line in journal:
+        try:
+          submission = json.loads(line)
+        except ValueError:
+          continue  # a write torn by the crash; it was never acknowledged
+        self._enqueue(submission)
+        self._stats['replayed'] += 1
+    if self._pending:
+      logger.warning('Replaying %d buffered review submission(s) from %s', len(self._pending), self.journal_path)
+
+  def _run(self):
+    while True:
+      with self._condition:
+        while not self._closed:
+          now = time.monotonic()
+          if self._retry_at is not None and now < self._retry_at:
+            self._condition.wait(self._retry_at - now)  # backing off after a failed write
+            continue
+          if self._pending_rows >= self.max_rows:
+            break
+          if self._pending and now - self._oldest >= self.interval:
+            break
+          timeout = self.interval - (now - self._oldest) if self._pending else None
+          self._condition.wait(timeout)
+        if self._closed and not self._pending:
+          return
+        closing = self._closed
+        batch = self._take()
+      retry = batch
+      try:
+        retry = self._flush(batch)
+      except Exception:
+        # The thread must outlive any failure, or the buffer fills up for good
+        logger.exception('Review flush failed, keeping the batch for a retry')
+      finally:
+        self._finish(batch, retry)
+      if closing and retry:
+        logger.error('Shutting down with %d review submission(s) unwritten%s', len(retry),
+                     ' (kept in the journal)' if self.journal_path else '')
+        return
+
+  # Take every queued submission (called with the condition held)
+  def _take(self):
+    batch, self._pending = self._pending, []
+    self._flushing_rows, self._pending_rows = self._pending_rows, 0
+    self._oldest = None
+    return batch
+
+  # Write the batch, one transaction per database it touches, and return the
+  # submissions to try again later
+  def _flush(self, batch):
+    learners = {}
+    for submission in batch:
+      learners.setdefault(submission.get('learner_id'), []).append(submission)
+    retry = []
+    for learner_id, submissions in learners.items():
+      try:
+        self._write(learner_id, submissions)
+      except PERMANENT_ERRORS:
+        # Don't let one bad submission take the batch down with it
+        logger.exception('Batched review flush failed, retrying submissions one by one')
+        for submission in submissions:
+          try:
+            self._write(learner_id, [submission])
+          except PERMANENT_ERRORS:
+            logger.exception('Dropping review submission %s', submission['key'])
+            with self._condition:
+              self._stats['failed'] += 1
+          except Exception as e:
+            logger.warning('Review flush failed (%s), retrying later', e)
+            retry.append(submission)
+      except Exception as e:
+        # The database is busy or unavailable (e.g. PoolTimeout): try again later
+        logger.warning('Review flush failed (%s), retrying later', e)
+        retry.extend(submissions)
+    return retry
+
+  # Release the batch's rows and requeue the submissions that failed, backing
+  # off exponentially until a flush succeeds again
+  def _finish(self, batch, retry):
+    retrying = {id(submission) for submission in retry}
+    written = [submission for submission in batch if id(submission) not in retrying]
+    with self._condition:
+      for submission in written:
+        self._pending_keys.pop((submission.get('learner_id'), submission['key']), None)
+      self._flushing_rows = 0
+      if retry:
+        self._pending[:0] = retry
+        self._pending_rows += sum(len(submission['reviews']) for submission in retry)
+        if self._oldest is None:
+          self._oldest = time.monotonic()
+        self._backoff = min(self.max_backoff, self._backoff * 2 or self.interval)
+        self._retry_at = time.monotonic() + self._backoff
+        self._stats['retried'] += len(retry)
+      else:
+        self._backoff = 0
+        self._retry_at = None
+      if written:
+        self._stats['flushes'] += 1
+        self._stats['rows_flushed'] += sum(len(submission['reviews']) for submission in written)
+      if self._journal:
+        self._uncompacted_flushes += 1
+        try:
+          if not self._pending:
+            self._truncate_journal()
+          elif self._uncompacted_flushes >= self.compact_every:
+            self._compact_journal()
+        except OSError:
+          logger.exception('Could not compact the review journal')
+      self._condition.notify_all()
+
+  def _write(self, learner_id, batch):
+    writer = self.db.for_learner(learner_id).writer
+    connection = writer.acquire()
+    try:
+      cursor = connection.cursor()
+      rows, ended, conflicts = [], [], []
+      for submission in batch:
+        cursor.execute('''
+          INSERT INTO review_submissions (idempotency_key, study_session_id, reviews_count)
+          VALUES (?, ?, ?)
+          ON CONFLICT (idempotency_key) DO NOTHING
+        ''', (submission['key'], submission['study_session_id'], len(submission['reviews'])))
+        if cursor.rowcount == 0:
+          # Already written (a replay, or a concurrent direct submission), unless
+          # the key belongs to another session
+          cursor.execute('''
+            SELECT study_session_id FROM review_submissions WHERE idempotency_key = ?
+          ''', (submission['key'],))
+          owner = cursor.fetchone()[0]
+          if owner != submission['study_session_id']:
+            conflicts.append((submission, owner))
+          continue
+        rows.extend((word_id, submission['study_session_id'], is_correct)
+                    for word_id, is_correct in submission['reviews'])
+        if submission['end_session']:
+          ended.append((submission['study_session_id'],))
+      cursor.executemany('''
+        INSERT INTO word_review_items (word_id, study_session_id, correct)
+        VALUES (?, ?, ?)
+      ''', rows)
+      cursor.executemany('''
+        UPDATE study_sessions SET ended_at = COALESCE(ended_at, CURRENT_TIMESTAMP)
+        WHERE id = ?
+      ''', ended)
+      connection.commit()
+    except Exception:
+      connection.rollback()
+      raise
+    finally:
+      writer.release(connection)
+    for submission, owner in conflicts:
+      logger.warning('Dropping review submission %s: its key was already used for study session %s',
+                     submission['key'], owner)
+    if conflicts:
+      with self._condition:
+        self._stats['rejected'] += len(conflicts)
+
+  # Everything journaled has been written (condition held). No fsync: if the
+  # truncation is lost in a crash, the replay finds every key already recorded.
+  def _truncate_journal(self):
+    self._journal.truncate(0)
+    self._uncompacted_flushes = 0
+
+  # Rewrite the journal to hold only what is still queued (condition held)
+  def _compact_journal(self):
+    temporary = self.journal_path + '.tmp'
+    with open(temporary, 'w', encoding='utf-8') as journal:
+      for submission in self._pending:
+        journal.write(json.dumps(submission) + '\n')
+      journal.flush()
+      os.fsync(journal.fileno())
+    self._journal.close()
+    os.replace(temporary, self.journal_path)
+    self._journal = open(self.journal_path, 'a', encoding='utf-8')
+    self._uncompacted_flushes = 0
+
+  # Write everything still queued and stop the flush thread
+  def close(self):
+    with self._condition:
+      if self._closed:
+        return
+      self._closed = True
+      self._condition.notify_all()
+    self._thread.join()
+    if self._journal:
+      self._journal.close()
+      self._journal = None
+
+  def stats(self):
+    with self._condition:
+      stats = dict(self._stats)
+      stats.update({
+        'pending_submissions': len(self._pending),
+        'pending_rows': self._buffered_rows(),
+        'capacity': self.capacity
+      })
+    return stats
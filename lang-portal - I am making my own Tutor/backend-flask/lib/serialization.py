@@ -0,0 +1,61 @@
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+# orjson and msgpack are optional: without orjson the app serializes with the
+# standard library as before, without msgpack it only ever answers JSON
+try:
+  import orjson
+except ImportError:
+  orjson = None
+
+try:
+  import msgpack
+except ImportError:
+  msgpack = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+# Same output as the default provider: sorted keys, and datetimes handed to
+# the provider's default() (HTTP dates) instead of orjson's ISO format
+ORJSON_OPTIONS = None
+if orjson is not None:
+  ORJSON_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+# True when the client names a MessagePack type and ranks it above JSON.
+# Wildcards don't count: fetch(), axios, curl and browsers send */* and expect JSON.
+def wants_msgpack():
+  if msgpack is None:
+    return False
+  accept = request.accept_mimetypes
+  quality = max((q for value, q in accept if value.lower() in MSGPACK_MIMETYPES), default=0)
+  return quality > accept.quality('application/json')
+
+# app.json provider: jsonify() and friends go through response() below, so
+# every route gets orjson and MessagePack negotiation without changes
+class JSONProvider(DefaultJSONProvider):
+  def dumps(self, obj, **kwargs):
+    # Anything but the compact defaults (e.g. indent) goes to the stdlib
+    if orjson is None or set(kwargs) - {'separators'}:
+      return super().dumps(obj, **kwargs)
+    return orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS).decode('utf-8')
+
+  def loads(self, s, **kwargs):
+    if orjson is None or kwargs:
+      return super().loads(s, **kwargs)
+    return orjson.loads(s)
+
+  def response(self, *args, **kwargs):
+    if wants_msgpack():
+      obj = self._prepare_response_obj(args, kwargs)
+      response = self._app.response_class(
+        msgpack.packb(obj, default=self.default, datetime=False),
+        mimetype='application/msgpack'
+      )
+    elif orjson is None or self._app.debug or self.compact is False:
+      response = super().response(*args, **kwargs)
+    else:
+      obj = self._prepare_response_obj(args, kwargs)
+      body = orjson.dumps(obj, default=self.default, option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+      response = self._app.response_class(body, mimetype=self.mimetype)
+    response.vary.add('Accept')
+    return response
@@ -1,31 +1,115 @@
 import sqlite3
+import hashlib
 import os
+import sys
 
-def run_migrations():
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
+
+class MigrationError(Exception):
+    pass
+
+def checksum(sql):
+    return hashlib.sha256(sql.encode('utf-8')).hexdigest()
+
+def load_migrations(migrations_dir=MIGRATIONS_DIR):
+    # (version, sql) pairs in filename order; the version is the file name
+    migrations = []
+    for migration_file in sorted(f for f in os.listdir(migrations_dir) if f.endswith('.sql')):
+        with open(os.path.join(migrations_dir, migration_file), encoding='utf-8') as f:
+            migrations.append((migration_file, f.read()))
+    return migrations
+
+def ensure_ledger(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version TEXT PRIMARY KEY,
+            checksum TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+def applied_migrations(conn):
+    return {row['version']: row['checksum'] for row in conn.execute('SELECT version, checksum FROM schema_migrations')}
+
+def check_drift(migrations, applied):
+    # Refuse to run if an applied migration was edited or removed afterwards
+    files = dict(migrations)
+    for version, applied_checksum in applied.items():
+        if version not in files:
+            raise MigrationError(f"Applied migration {version} no longer exists in sql/migrations")
+        if checksum(files[version]) != applied_checksum:
+            raise MigrationError(f"Checksum drift: {version} changed after it was applied")
+
+def apply_migration(conn, version, sql):
+    # The script and its ledger row commit together or not at all. BEGIN is part
+    # of the script because executescript() commits any open transaction first.
+    # IMMEDIATE takes the write lock up front; if another process applied the
+    # same file meanwhile, the ledger insert fails and everything is rolled back.
+    try:
+        conn.executescript('BEGIN IMMEDIATE;\n' + sql)
+        try:
+            conn.execute(
+                'INSERT INTO schema_migrations (version, checksum) VALUES (?, ?)',
+                (version, checksum(sql))
+            )
+        except sqlite3.IntegrityError:
+            conn.execute('ROLLBACK')
+            return False
+        conn.execute('COMMIT')
+        return True
+    except Exception:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+
+def bump_table_versions(conn):
+    # Migrations can rewrite data behind the app's back (backfills, rebuilt tables),
+    # so invalidate every ETag derived from table_versions
+    try:
+        conn.execute('''
+            UPDATE table_versions
+            SET version = version + 1, updated_at = strftime('%Y-%m-%d %H:%M:%f', 'now')
+        ''')
+    except sqlite3.OperationalError:
+        pass
+
+def run_migrations(db_path=None, migrations_dir=MIGRATIONS_DIR):
     # Connect to the database
-    db_path = os.path.join(os.path.dirname(__file__), 'word_bank.db')
-    conn = sqlite3.connect(db_path)
+    if db_path is None:
+        db_path = os.path.join(os.path.dirname(__file__), 'words.db')
+    # Autocommit mode: transactions are managed explicitly in apply_migration
+    conn = sqlite3.connect(db_path, isolation_level=None)
     conn.row_factory = sqlite3.Row
-    
+
     try:
-        # Get list of migration files
-        migrations_dir = os.path.join(os.path.dirname(__file__), 'sql', 'migrations')
-        migration_files = sorted([f for f in os.listdir(migrations_dir) if f.endswith('.sql')])
-        
-        # Run each migration
-        for migration_file in migration_files:
-            print(f"Running migration: {migration_file}")
-            with open(os.path.join(migrations_dir, migration_file)) as f:
-                migration_sql = f.read()
-                conn.executescript(migration_sql)
-                conn.commit()
-        
-        print("Migrations completed successfully")
-    except Exception as e:
-        print(f"Error running migrations: {str(e)}")
-        conn.rollback()
+        ensure_ledger(conn)
+        migrations = load_migrations(migrations_dir)
+        applied = applied_migrations(conn)
+        check_drift(migrations, applied)
+
+        pending = [(version, sql) for version, sql in migrations if version not in applied]
+        if not pending:
+            print("Database is up to date")
+            return []
+
+        completed = []
+        for version, sql in pending:
+            print(f"Running migration: {version}")
+            try:
+                if apply_migration(conn, version, sql):
+                    completed.append(version)
+            except sqlite3.Error as e:
+                raise MigrationError(f"{version} failed and was rolled back: {e}") from e
+
+        bump_table_versions(conn)
+        print(f"Applied {len(completed)} migration(s)")
+        return completed
     finally:
         conn.close()
 
 if __name__ == '__main__':
-    run_migrations()
+    try:
+        run_migrations(*sys.argv[1:2])
+    except MigrationError as e:
+        print(f"Error running migrations: {e}")
+        sys.exit(1)
@@ -2,26 +2,28 @@ from flask import jsonify
 from flask_cors import cross_origin
 from datetime import datetime, timedelta
 
+from lib.http_cache import conditional
+
 def load(app):
     @app.route('/dashboard/recent-session', methods=['GET'])
     @cross_origin()
+    @conditional('study_sessions', 'study_activities', 'word_review_items', cache=True)
     def get_recent_session():
         try:
             cursor = app.db.cursor()
             
             # Get the most recent study session with activity name and results
+            # (the counts are maintained on study_sessions by migration 0008)
             cursor.execute('''
                 SELECT 
                     ss.id,
                     ss.group_id,
                     sa.name as activity_name,
                     ss.created_at,
-                    COUNT(CASE WHEN wri.correct = 1 THEN 1 END) as correct_count,
-                    COUNT(CASE WHEN wri.correct = 0 THEN 1 END) as wrong_count
+                    ss.correct_count,
+                    ss.review_count - ss.correct_count as wrong_count
                 FROM study_sessions ss
                 JOIN study_activities sa ON ss.study_activity_id = sa.id
-                LEFT JOIN word_review_items wri ON ss.id = wri.study_session_id
-                GROUP BY ss.id
                 ORDER BY ss.created_at DESC
                 LIMIT 1
             ''')
@@ -45,94 +47,62 @@ def load(app):
 
     @app.route('/dashboard/stats', methods=['GET'])
     @cross_origin()
+    @conditional('words', 'study_sessions', 'word_review_items', 'word_reviews', 'daily_stats', 'word_mastery', per_day=True, cache=True)
     def get_study_stats():
         try:
             cursor = app.db.cursor()
             
-            # Get total vocabulary count
-            cursor.execute('SELECT COUNT(*) as total_vocabulary FROM words')
-            total_vocabulary = cursor.fetchone()["total_vocabulary"]
-
-            # Get total unique words studied
-            cursor.execute('''
-                SELECT COUNT(DISTINCT word_id) as total_words
-                FROM word_review_items wri
-                JOIN study_sessions ss ON wri.study_session_id = ss.id
-            ''')
-            total_words = cursor.fetchone()["total_words"]
-            
-            # Get mastered words (words with >80% success rate and at least 5 attempts)
+            # Everything is read from the trigger-maintained rollups (daily_stats,
+            # word_mastery) in one statement, so the cost doesn't grow with the
+            # number of review items. See sql/migrations/0004_dashboard_rollups.sql.
             cursor.execute('''
-                WITH word_stats AS (
+                WITH RECURSIVE
+                totals AS (
                     SELECT 
-                        word_id,
-                        COUNT(*) as total_attempts,
-                        SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
-                    FROM word_review_items wri
-                    JOIN study_sessions ss ON wri.study_session_id = ss.id
-                    GROUP BY word_id
-                    HAVING total_attempts >= 5
-                )
-                SELECT COUNT(*) as mastered_words
-                FROM word_stats
-                WHERE success_rate >= 0.8
-            ''')
-            mastered_words = cursor.fetchone()["mastered_words"]
-            
-            # Get overall success rate
-            cursor.execute('''
-                SELECT 
-                    SUM(CASE WHEN correct = 1 THEN 1 ELSE 0 END) * 1.0 / COUNT(*) as success_rate
-                FROM word_review_items wri
-                JOIN study_sessions ss ON wri.study_session_id = ss.id
-            ''')
-            success_rate = cursor.fetchone()["success_rate"] or 0
-            
-            # Get total number of study sessions
-            cursor.execute('SELECT COUNT(*) as total_sessions FROM study_sessions')
-            total_sessions = cursor.fetchone()["total_sessions"]
-            
-            # Get number of groups with activity in the last 30 days
-            cursor.execute('''
-                SELECT COUNT(DISTINCT group_id) as active_groups
-                FROM study_sessions
-                WHERE created_at >= date('now', '-30 days')
-            ''')
-            active_groups = cursor.fetchone()["active_groups"]
-            
-            # Calculate current streak (consecutive days with at least one study session)
-            cursor.execute('''
-                WITH daily_sessions AS (
-                    SELECT 
-                        date(created_at) as study_date,
-                        COUNT(*) as session_count
-                    FROM study_sessions
-                    GROUP BY date(created_at)
+                        COALESCE(SUM(sessions_count), 0) as total_sessions,
+                        COALESCE(SUM(review_count), 0) as review_count,
+                        COALESCE(SUM(correct_count), 0) as correct_count
+                    FROM daily_stats
                 ),
-                streak_calc AS (
-                    SELECT 
-                        study_date,
-                        julianday(study_date) - julianday(lag(study_date, 1) over (order by study_date)) as days_diff
-                    FROM daily_sessions
-                )
-                SELECT COUNT(*) as streak
-                FROM (
-                    SELECT study_date
-                    FROM streak_calc
-                    WHERE days_diff = 1 OR days_diff IS NULL
-                    ORDER BY study_date DESC
+                -- Current streak: consecutive study days ending today (or yesterday,
+                -- if nothing has been studied yet today), walked day by day
+                streak(study_date) AS (
+                    SELECT MAX(study_date)
+                    FROM daily_stats
+                    WHERE study_date >= date('now', '-1 day') AND sessions_count > 0
+                    UNION ALL
+                    SELECT date(streak.study_date, '-1 day')
+                    FROM streak
+                    WHERE EXISTS (
+                        SELECT 1 FROM daily_stats ds
+                        WHERE ds.study_date = date(streak.study_date, '-1 day') AND ds.sessions_count > 0
+                    )
                 )
+                SELECT 
+                    (SELECT COUNT(*) FROM words) as total_vocabulary,
+                    wm.words_studied as total_words,
+                    wm.mastered_words,
+                    CASE WHEN t.review_count > 0 THEN t.correct_count * 1.0 / t.review_count ELSE 0 END as success_rate,
+                    t.total_sessions,
+                    (
+                        SELECT COUNT(DISTINCT group_id)
+                        FROM daily_stats
+                        WHERE study_date >= date('now', '-30 days') AND sessions_count > 0
+                    ) as active_groups,
+                    (SELECT COUNT(study_date) FROM streak) as streak
+                FROM word_mastery wm, totals t
+                WHERE wm.id = 1
             ''')
-            current_streak = cursor.fetchone()["streak"]
+            stats = cursor.fetchone()
             
             return jsonify({
-                "total_vocabulary": total_vocabulary,
-                "total_words_studied": total_words,
-                "mastered_words": mastered_words,
-                "success_rate": success_rate,
-                "total_sessions": total_sessions,
-                "active_groups": active_groups,
-                "current_streak": current_streak
+                "total_vocabulary": stats["total_vocabulary"],
+                "total_words_studied": stats["total_words"],
+                "mastered_words": stats["mastered_words"],
+                "success_rate": stats["success_rate"],
+                "total_sessions": stats["total_sessions"],
+                "active_groups": stats["active_groups"],
+                "current_streak": stats["streak"]
             })
             
         except Exception as e:
@@ -0,0 +1,101 @@
+from flask import request, jsonify, Response, stream_with_context
+from flask_cors import cross_origin
+from datetime import datetime
+import csv
+import io
+import json
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_COLUMNS = [
+  'review_id', 'reviewed_at', 'correct',
+  'word_id', 'kanji', 'romaji', 'english',
+  'study_session_id', 'session_started_at',
+  'group_id', 'group_name',
+  'study_activity_id', 'activity_name'
+]
+
+EXPORT_FORMATS = {
+  'ndjson': 'application/x-ndjson',
+  'csv': 'text/csv; charset=utf-8'
+}
+
+def ndjson_chunk(rows):
+  return ''.join(json.dumps(dict(zip(EXPORT_COLUMNS, row)), ensure_ascii=False) + '\n' for row in rows)
+
+def csv_chunk(rows, header=False):
+  buffer = io.StringIO()
+  writer = csv.writer(buffer)
+  if header:
+    writer.writerow(EXPORT_COLUMNS)
+  writer.writerows(rows)
+  return buffer.getvalue()
+
+def load(app):
+  # Endpoint: GET /api/export/reviews?format=ndjson|csv&since=
+  # Streams the whole review history (optionally only reviews at or after
+  # `since`) in time order. Rows are pulled from the cursor EXPORT_BATCH_SIZE at
+  # a time and written out as they come, so memory stays flat however long the
+  # history is; the response has no Content-Length and goes out chunked.
+  @app.route('/api/export/reviews', methods=['GET'])
+  @cross_origin()
+  def export_reviews():
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+      return jsonify({"error": f"format must be one of: {', '.join(EXPORT_FORMATS)}"}), 400
+
+    since = request.args.get('since')
+    if since:
+      try:
+        since = datetime.fromisoformat(since).strftime('%Y-%m-%d %H:%M:%S')
+      except ValueError:
+        return jsonify({"error": "since must be an ISO 8601 date or datetime"}), 400
+
+    try:
+      cursor = app.db.cursor()
+      cursor.execute(f'''
+        SELECT
+          wri.id,
+          wri.created_at,
+          wri.correct,
+          w.id,
+          w.kanji,
+          w.romaji,
+          w.english,
+          ss.id,
+          ss.created_at,
+          g.id,
+          g.name,
+          sa.id,
+          sa.name
+        FROM word_review_items wri
+        JOIN words w ON w.id = wri.word_id
+        LEFT JOIN study_sessions ss ON ss.id = wri.study_session_id
+        LEFT JOIN groups g ON g.id = ss.group_id
+        LEFT JOIN study_activities sa ON sa.id = ss.study_activity_id
+        {'WHERE wri.created_at >= ?' if since else ''}
+        ORDER BY wri.created_at, wri.id
+      ''', (since,) if since else ())
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+    # The request's connection (and its read transaction) stays checked out
+    # until the generator is exhausted or the client goes away
+    @stream_with_context
+    def generate():
+      try:
+        if export_format == 'csv':
+          yield csv_chunk([], header=True)
+        while True:
+          rows = cursor.fetchmany(EXPORT_BATCH_SIZE)
+          if not rows:
+            break
+          yield ndjson_chunk(rows) if export_format == 'ndjson' else csv_chunk(rows)
+      finally:
+        cursor.close()
+
+    filename = f"reviews.{export_format}"
+    return Response(generate(), content_type=EXPORT_FORMATS[export_format], headers={
+      'Content-Disposition': f'attachment; filename="{filename}"',
+      'X-Accel-Buffering': 'no'  # don't let a reverse proxy buffer the stream
+    })
@@ -2,9 +2,14 @@ from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
 
+from lib.pagination import InvalidCursor, decode_cursor, seek_clause, keyset_page
+from lib.http_cache import conditional
+from routes.words import WORD_LIST_SORTS, format_word
+
 def load(app):
   @app.route('/groups', methods=['GET'])
   @cross_origin()
+  @conditional('groups', 'word_groups')
   def get_groups():
     try:
       cursor = app.db.cursor()
@@ -60,6 +65,7 @@ def load(app):
 
   @app.route('/groups/<int:id>', methods=['GET'])
   @cross_origin()
+  @conditional('groups', 'word_groups')
   def get_group(id):
     try:
       cursor = app.db.cursor()
@@ -85,6 +91,7 @@ def load(app):
 
   @app.route('/groups/<int:id>/words', methods=['GET'])
   @cross_origin()
+  @conditional('groups', 'word_groups', 'words', 'word_reviews', 'word_review_items')
   def get_group_words(id):
     try:
       cursor = app.db.cursor()
@@ -111,16 +118,39 @@ def load(app):
       if not group:
         return jsonify({"error": "Group not found"}), 404
 
+      sort_expression, id_expression = WORD_LIST_SORTS[sort_by]
+      page_cursor = request.args.get('cursor')
+
+      # Same sorts as GET /words; every word has a word_reviews row (see there)
+      # Keyset mode: seek past the (sort value, id) of the previous page's last row
+      if page_cursor is not None:
+        seek = decode_cursor(page_cursor, sort_by, order)
+        seek_sql = 'AND ' + seek_clause(sort_expression, id_expression, order) if seek else ''
+        cursor.execute(f'''
+          SELECT w.*, r.correct_count, r.wrong_count,
+                 {sort_expression} as sort_key
+          FROM words w
+          JOIN word_groups wg ON w.id = wg.word_id
+          JOIN word_reviews r ON w.id = r.word_id
+          WHERE wg.group_id = ? {seek_sql}
+          ORDER BY {sort_expression} {order}, {id_expression} {order}
+          LIMIT ?
+        ''', (id, *(seek or ()), words_per_page + 1))
+
+        words, next_cursor = keyset_page(cursor.fetchall(), words_per_page, sort_by, order)
+        return jsonify({
+          'words': [format_word(word) for word in words],
+          'next_cursor': next_cursor
+        })
+
       # Query to fetch words with pagination and sorting
       cursor.execute(f'''
-        SELECT w.*, 
-               COALESCE(wr.correct_count, 0) as correct_count,
-               COALESCE(wr.wrong_count, 0) as wrong_count
+        SELECT w.*, r.correct_count, r.wrong_count
         FROM words w
         JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN word_reviews wr ON w.id = wr.word_id
+        JOIN word_reviews r ON w.id = r.word_id
         WHERE wg.group_id = ?
-        ORDER BY {sort_by} {order}
+        ORDER BY {sort_expression} {order}, {id_expression} {order}
         LIMIT ? OFFSET ?
       ''', (id, words_per_page, offset))
       
@@ -136,29 +166,78 @@ def load(app):
       total_pages = (total_words + words_per_page - 1) // words_per_page
 
       # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
-        })
+      words_data = [format_word(word) for word in words]
 
       return jsonify({
         'words': words_data,
         'total_pages': total_pages,
         'current_page': page
       })
+    except InvalidCursor as e:
+      return jsonify({"error": str(e)}), 400
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
-  # todo GET /groups/:id/words/raw
+  # What GET /groups/:id/words/raw reads besides the words themselves: the
+  # group's name and membership (answered from the word_groups primary key)
+  def group_words_signature(id):
+    cursor = app.db.cursor()
+    cursor.execute('''
+      SELECT g.name, COUNT(wg.word_id), MAX(wg.word_id), SUM(wg.word_id)
+      FROM groups g
+      LEFT JOIN word_groups wg ON wg.group_id = g.id
+      WHERE g.id = ?
+    ''', (id,))
+    return tuple(cursor.fetchone())
+
+  # Endpoint: GET /groups/:id/words/raw
+  # Every word of the group in one unpaginated, columnar payload for study
+  # activities: {"columns": {"id": [...], "kanji": [...], ..., "parts": [...]}},
+  # where the i-th entry of each column belongs to the same word. SQLite builds
+  # the JSON itself, parsing the stored parts on the way. Always JSON, even
+  # for clients that ask for MessagePack.
+  @app.route('/groups/<int:id>/words/raw', methods=['GET'])
+  @cross_origin()
+  @conditional('words', signature=group_words_signature, json_only=True,
+               last_modified=('groups', 'word_groups', 'words'))
+  def get_group_words_raw(id):
+    try:
+      cursor = app.db.cursor()
+
+      cursor.execute('SELECT name FROM groups WHERE id = ?', (id,))
+      group = cursor.fetchone()
+      if not group:
+        return jsonify({"error": "Group not found"}), 404
+
+      cursor.execute('''
+        SELECT json_object(
+          'group_id', ?,
+          'group_name', ?,
+          'count', COUNT(*),
+          'columns', json_object(
+            'id', json_group_array(id),
+            'kanji', json_group_array(kanji),
+            'romaji', json_group_array(romaji),
+            'english', json_group_array(english),
+            'parts', json_group_array(json(parts))
+          )
+        )
+        FROM (
+          SELECT w.id, w.kanji, w.romaji, w.english, w.parts
+          FROM word_groups wg
+          JOIN words w ON w.id = wg.word_id
+          WHERE wg.group_id = ?
+          ORDER BY wg.word_id
+        )
+      ''', (id, group['name'], id))
+
+      return app.response_class(cursor.fetchone()[0], mimetype='application/json')
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
 
   @app.route('/groups/<int:id>/study_sessions', methods=['GET'])
   @cross_origin()
+  @conditional('groups', 'study_sessions', 'study_activities', 'word_review_items')
   def get_group_study_sessions(id):
     try:
       cursor = app.db.cursor()
@@ -172,72 +251,82 @@ def load(app):
       sort_by = request.args.get('sort_by', 'created_at')
       order = request.args.get('order', 'desc')  # Default to newest first
 
-      # Map frontend sort keys to database columns
+      # Map frontend sort keys to columns of the session query below
       sort_mapping = {
-        'startTime': 'created_at',
-        'endTime': 'last_activity_time',
-        'activityName': 'a.name',
-        'groupName': 'g.name',
+        'startTime': 'start_time',
+        'endTime': 'end_time',
+        'activityName': 'activity_name',
+        'groupName': 'group_name',
         'reviewItemsCount': 'review_count'
       }
 
-      # Use mapped sort column or default to created_at
-      sort_column = sort_mapping.get(sort_by, 'created_at')
+      # Use mapped sort column or default to start_time
+      if sort_by not in sort_mapping:
+        sort_by = 'startTime'
+      if order not in ['asc', 'desc']:
+        order = 'desc'
+      sort_expression = sort_mapping[sort_by]
+      page_cursor = request.args.get('cursor')
+      seek = decode_cursor(page_cursor, sort_by, order) if page_cursor is not None else None
 
-      # Get total count for pagination
-      cursor.execute('''
-        SELECT COUNT(*)
-        FROM study_sessions
-        WHERE group_id = ?
-      ''', (id,))
-      total_sessions = cursor.fetchone()[0]
-      total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
+      if page_cursor is None:
+        # Get total count for pagination
+        cursor.execute('''
+          SELECT COUNT(*)
+          FROM study_sessions
+          WHERE group_id = ?
+        ''', (id,))
+        total_sessions = cursor.fetchone()[0]
+        total_pages = (total_sessions + sessions_per_page - 1) // sessions_per_page
+        paging_sql, paging_params = 'LIMIT ? OFFSET ?', (sessions_per_page, offset)
+      else:
+        paging_sql, paging_params = 'LIMIT ?', (sessions_per_page + 1,)
+      seek_sql = 'WHERE ' + seek_clause(sort_expression, 'id', order) if seek else ''
 
-      # Get study sessions for this group with dynamic calculations
+      # Review counts and last activity are maintained on study_sessions
+      # (migration 0008), so a page is a single read of the group's sessions.
+      # Sessions that were neither ended nor reviewed end 30 minutes after they
+      # started.
       cursor.execute(f'''
-        SELECT 
-          s.id,
-          s.group_id,
-          s.study_activity_id,
-          s.created_at as start_time,
-          (
-            SELECT MAX(created_at)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as last_activity_time,
-          a.name as activity_name,
-          g.name as group_name,
-          (
-            SELECT COUNT(*)
-            FROM word_review_items
-            WHERE study_session_id = s.id
-          ) as review_count
-        FROM study_sessions s
-        JOIN study_activities a ON s.study_activity_id = a.id
-        JOIN groups g ON s.group_id = g.id
-        WHERE s.group_id = ?
-        ORDER BY {sort_column} {order}
-        LIMIT ? OFFSET ?
-      ''', (id, sessions_per_page, offset))
+        SELECT *, {sort_expression} as sort_key
+        FROM (
+          SELECT 
+            s.id,
+            s.group_id,
+            s.study_activity_id,
+            s.created_at as start_time,
+            COALESCE(s.ended_at, s.last_activity_at, datetime(s.created_at, '+30 minutes')) as end_time,
+            a.name as activity_name,
+            g.name as group_name,
+            s.review_count
+          FROM study_sessions s
+          JOIN study_activities a ON s.study_activity_id = a.id
+          JOIN groups g ON s.group_id = g.id
+          WHERE s.group_id = ?
+        )
+        {seek_sql}
+        ORDER BY {sort_expression} {order}, id {order}
+        {paging_sql}
+      ''', (id, *(seek or ()), *paging_params))
       
       sessions = cursor.fetchall()
-      sessions_data = []
-      
-      for session in sessions:
-        # If there's no last_activity_time, use start_time + 30 minutes
-        end_time = session["last_activity_time"]
-        if not end_time:
-            end_time = cursor.execute('SELECT datetime(?, "+30 minutes")', (session["start_time"],)).fetchone()[0]
-        
-        sessions_data.append({
-          "id": session["id"],
-          "group_id": session["group_id"],
-          "group_name": session["group_name"],
-          "study_activity_id": session["study_activity_id"],
-          "activity_name": session["activity_name"],
-          "start_time": session["start_time"],
-          "end_time": end_time,
-          "review_items_count": session["review_count"]
+      if page_cursor is not None:
+        sessions, next_cursor = keyset_page(sessions, sessions_per_page, sort_by, order)
+      sessions_data = [{
+        "id": session["id"],
+        "group_id": session["group_id"],
+        "group_name": session["group_name"],
+        "study_activity_id": session["study_activity_id"],
+        "activity_name": session["activity_name"],
+        "start_time": session["start_time"],
+        "end_time": session["end_time"],
+        "review_items_count": session["review_count"]
+      } for session in sessions]
+
+      if page_cursor is not None:
+        return jsonify({
+          'study_sessions': sessions_data,
+          'next_cursor': next_cursor
         })
 
       return jsonify({
@@ -245,5 +334,83 @@ def load(app):
         'total_pages': total_pages,
         'current_page': page
       })
+    except InvalidCursor as e:
+      return jsonify({"error": str(e)}), 400
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /groups/:id/due?limit=
+  # Pops the group's next words to study, most overdue first, from the
+  # (group_id, due_at) index of word_schedules (see migration 0009). Popping
+  # leases the words: their due_at moves DUE_LEASE_MINUTES ahead, so activities
+  # launched together get different words. Reviewing a word reschedules it as
+  # usual; a word that isn't reviewed is due again when its lease runs out. Not
+  # cached, since every request changes the queue.
+  @app.route('/groups/<int:id>/due', methods=['GET'])
+  @cross_origin()
+  def get_group_due_words(id):
+    try:
+      app.db.use_writer()
+      cursor = app.db.cursor()
+      limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+      lease = f"+{app.config.get('DUE_LEASE_MINUTES', 10)} minutes"
+
+      cursor.execute('SELECT id FROM groups WHERE id = ?', (id,))
+      if not cursor.fetchone():
+        return jsonify({"error": "Group not found"}), 404
+
+      cursor.execute('''
+        SELECT
+          w.id,
+          w.kanji,
+          w.romaji,
+          w.english,
+          ws.due_at,
+          ws.reviewed_at,
+          ws.ease,
+          ws.interval_days,
+          ws.repetitions
+        FROM word_schedules ws
+        JOIN words w ON w.id = ws.word_id
+        WHERE ws.group_id = ? AND ws.due_at <= datetime('now')
+        ORDER BY ws.due_at, ws.word_id
+        LIMIT ?
+      ''', (id, limit))
+      words = cursor.fetchall()
+
+      # Claim them by primary key; the due_at check (kept off the index with +)
+      # skips words another process popped meanwhile
+      cursor.execute('''
+        UPDATE word_schedules SET due_at = datetime('now', ?)
+        WHERE group_id = ? AND word_id IN (SELECT value FROM json_each(?))
+          AND +due_at <= datetime('now')
+        RETURNING word_id
+      ''', (lease, id, json.dumps([word['id'] for word in words])))
+      claimed = {row['word_id'] for row in cursor.fetchall()}
+      app.db.commit()
+      words = [word for word in words if word['id'] in claimed]
+
+      # When the queue runs dry, tell the client when to come back
+      cursor.execute('''
+        SELECT MIN(due_at) FROM word_schedules
+        WHERE group_id = ? AND due_at > datetime('now')
+      ''', (id,))
+      next_due_at = cursor.fetchone()[0]
+
+      return jsonify({
+        'group_id': id,
+        'words': [{
+          'id': word['id'],
+          'kanji': word['kanji'],
+          'romaji': word['romaji'],
+          'english': word['english'],
+          'due_at': word['due_at'],
+          'reviewed_at': word['reviewed_at'],
+          'ease': word['ease'],
+          'interval_days': word['interval_days'],
+          'repetitions': word['repetitions']
+        } for word in words],
+        'next_due_at': next_due_at
+      })
     except Exception as e:
-      return jsonify({"error": str(e)}), 500
\ No newline at end of file
+      return jsonify({"error": str(e)}), 500
@@ -0,0 +1,7 @@
+from flask import Response
+
+def load(app):
+  # Prometheus scrape target; see lib/metrics.py
+  @app.route('/metrics', methods=['GET'])
+  def get_metrics():
+    return Response(app.metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -2,9 +2,14 @@ from flask import jsonify, request
 from flask_cors import cross_origin
 import math
 
+from lib.pagination import InvalidCursor, decode_cursor, seek_clause, keyset_page
+from lib.http_cache import conditional
+from routes.study_sessions import format_session
+
 def load(app):
     @app.route('/api/study-activities', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities')
     def get_study_activities():
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities')
@@ -19,6 +24,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities')
     def get_study_activity(id):
         cursor = app.db.cursor()
         cursor.execute('SELECT id, name, url, preview_url FROM study_activities WHERE id = ?', (id,))
@@ -36,6 +42,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/sessions', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities', 'study_sessions', 'groups', 'word_review_items')
     def get_study_activity_sessions(id):
         cursor = app.db.cursor()
         
@@ -47,49 +54,63 @@ def load(app):
         # Get pagination parameters
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
+        if per_page < 1:
+            return jsonify({'error': 'per_page must be at least 1'}), 400
         offset = (page - 1) * per_page
 
-        # Get total count
-        cursor.execute('''
-            SELECT COUNT(*) as count 
-            FROM study_sessions ss
-            JOIN groups g ON g.id = ss.group_id
-            WHERE ss.study_activity_id = ?
-        ''', (id,))
-        total_count = cursor.fetchone()['count']
+        # Pass cursor= (empty for the first page) to page by keyset instead of offset
+        page_cursor = request.args.get('cursor')
+        try:
+            seek = decode_cursor(page_cursor, 'created_at', 'desc') if page_cursor is not None else None
+        except InvalidCursor as e:
+            return jsonify({'error': str(e)}), 400
+
+        if page_cursor is None:
+            # Get total count
+            cursor.execute('''
+                SELECT COUNT(*) as count 
+                FROM study_sessions ss
+                JOIN groups g ON g.id = ss.group_id
+                WHERE ss.study_activity_id = ?
+            ''', (id,))
+            total_count = cursor.fetchone()['count']
+            paging_sql, paging_params = 'LIMIT ? OFFSET ?', (per_page, offset)
+        else:
+            paging_sql, paging_params = 'LIMIT ?', (per_page + 1,)
+        seek_sql = 'AND ' + seek_clause('ss.created_at', 'ss.id', 'desc') if seek else ''
 
         # Get paginated sessions
-        cursor.execute('''
+        cursor.execute(f'''
             SELECT 
                 ss.id,
                 ss.group_id,
                 g.name as group_name,
                 sa.name as activity_name,
                 ss.created_at,
+                ss.created_at as sort_key,
                 ss.study_activity_id as activity_id,
-                COUNT(wri.id) as review_items_count
+                ss.last_activity_at,
+                ss.ended_at,
+                ss.review_count
             FROM study_sessions ss
             JOIN groups g ON g.id = ss.group_id
             JOIN study_activities sa ON sa.id = ss.study_activity_id
-            LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-            WHERE ss.study_activity_id = ?
-            GROUP BY ss.id, ss.group_id, g.name, sa.name, ss.created_at, ss.study_activity_id
-            ORDER BY ss.created_at DESC
-            LIMIT ? OFFSET ?
-        ''', (id, per_page, offset))
+            WHERE ss.study_activity_id = ? {seek_sql}
+            ORDER BY ss.created_at DESC, ss.id DESC
+            {paging_sql}
+        ''', (id, *(seek or ()), *paging_params))
         sessions = cursor.fetchall()
 
+        if page_cursor is not None:
+            sessions, next_cursor = keyset_page(sessions, per_page, 'created_at', 'desc')
+            return jsonify({
+                'items': [format_session(session) for session in sessions],
+                'per_page': per_page,
+                'next_cursor': next_cursor
+            })
+
         return jsonify({
-            'items': [{
-                'id': session['id'],
-                'group_id': session['group_id'],
-                'group_name': session['group_name'],
-                'activity_id': session['activity_id'],
-                'activity_name': session['activity_name'],
-                'start_time': session['created_at'],
-                'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-                'review_items_count': session['review_items_count']
-            } for session in sessions],
+            'items': [format_session(session) for session in sessions],
             'total': total_count,
             'page': page,
             'per_page': per_page,
@@ -98,6 +119,7 @@ def load(app):
 
     @app.route('/api/study-activities/<int:id>/launch', methods=['GET'])
     @cross_origin()
+    @conditional('study_activities', 'groups', cache=True)
     def get_study_activity_launch_data(id):
         cursor = app.db.cursor()
         
@@ -119,8 +141,10 @@ def load(app):
                 'launch_url': activity['url'],
                 'preview_url': activity['preview_url']
             },
+            # Activities fetch the words to study from the group's due queue
             'groups': [{
                 'id': group['id'],
-                'name': group['name']
+                'name': group['name'],
+                'due_url': f"/groups/{group['id']}/due"
             } for group in groups]
         })
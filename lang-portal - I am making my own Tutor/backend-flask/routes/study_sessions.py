@@ -1,13 +1,35 @@
 from flask import request, jsonify, g
 from flask_cors import cross_origin
 from datetime import datetime
+import json
 import math
+import sqlite3
+
+from lib.pagination import InvalidCursor, decode_cursor, seek_clause, keyset_page
+from lib.http_cache import conditional
+from lib.review_buffer import BufferFull
+
+MAX_REVIEWS_PER_SUBMISSION = 1000
+
+def format_session(session):
+  return {
+    'id': session['id'],
+    'group_id': session['group_id'],
+    'group_name': session['group_name'],
+    'activity_id': session['activity_id'],
+    'activity_name': session['activity_name'],
+    'start_time': session['created_at'],
+    'end_time': session['ended_at'] or session['last_activity_at'] or session['created_at'],
+    'review_items_count': session['review_count']
+  }
 
 def load(app):
   # todo /study_sessions POST
 
+  # Pass cursor= (empty for the first page) to page by keyset instead of offset
   @app.route('/api/study-sessions', methods=['GET'])
   @cross_origin()
+  @conditional('study_sessions', 'groups', 'study_activities', 'word_review_items')
   def get_study_sessions():
     try:
       cursor = app.db.cursor()
@@ -15,19 +37,29 @@ def load(app):
       # Get pagination parameters
       page = request.args.get('page', 1, type=int)
       per_page = request.args.get('per_page', 10, type=int)
+      if per_page < 1:
+        return jsonify({"error": "per_page must be at least 1"}), 400
       offset = (page - 1) * per_page
 
-      # Get total count
-      cursor.execute('''
-        SELECT COUNT(*) as count 
-        FROM study_sessions ss
-        JOIN groups g ON g.id = ss.group_id
-        JOIN study_activities sa ON sa.id = ss.study_activity_id
-      ''')
-      total_count = cursor.fetchone()['count']
+      page_cursor = request.args.get('cursor')
+      seek = decode_cursor(page_cursor, 'created_at', 'desc') if page_cursor is not None else None
 
-      # Get paginated sessions
-      cursor.execute('''
+      if page_cursor is None:
+        # Get total count (answered from the created_at index; sessions always
+        # reference an existing group and activity)
+        cursor.execute('''
+          SELECT COUNT(*) as count 
+          FROM study_sessions
+        ''')
+        total_count = cursor.fetchone()['count']
+        paging_sql, paging_params = 'LIMIT ? OFFSET ?', (per_page, offset)
+      else:
+        paging_sql, paging_params = 'LIMIT ?', (per_page + 1,)
+      seek_sql = 'WHERE ' + seek_clause('ss.created_at', 'ss.id', 'desc') if seek else ''
+
+      # Get paginated sessions (walks the created_at index; review counts and
+      # end times are maintained on study_sessions by migration 0008)
+      cursor.execute(f'''
         SELECT 
           ss.id,
           ss.group_id,
@@ -35,38 +67,42 @@ def load(app):
           sa.id as activity_id,
           sa.name as activity_name,
           ss.created_at,
-          COUNT(wri.id) as review_items_count
+          ss.created_at as sort_key,
+          ss.last_activity_at,
+          ss.ended_at,
+          ss.review_count
         FROM study_sessions ss
         JOIN groups g ON g.id = ss.group_id
         JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
-        GROUP BY ss.id
-        ORDER BY ss.created_at DESC
-        LIMIT ? OFFSET ?
-      ''', (per_page, offset))
+        {seek_sql}
+        ORDER BY ss.created_at DESC, ss.id DESC
+        {paging_sql}
+      ''', (*(seek or ()), *paging_params))
       sessions = cursor.fetchall()
 
+      if page_cursor is not None:
+        sessions, next_cursor = keyset_page(sessions, per_page, 'created_at', 'desc')
+        return jsonify({
+          'items': [format_session(session) for session in sessions],
+          'per_page': per_page,
+          'next_cursor': next_cursor
+        })
+
       return jsonify({
-        'items': [{
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time since we don't track end time
-          'review_items_count': session['review_items_count']
-        } for session in sessions],
+        'items': [format_session(session) for session in sessions],
         'total': total_count,
         'page': page,
         'per_page': per_page,
         'total_pages': math.ceil(total_count / per_page)
       })
+    except InvalidCursor as e:
+      return jsonify({"error": str(e)}), 400
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
   @app.route('/api/study-sessions/<id>', methods=['GET'])
   @cross_origin()
+  @conditional('study_sessions', 'groups', 'study_activities', 'word_review_items', 'words')
   def get_study_session(id):
     try:
       cursor = app.db.cursor()
@@ -80,13 +116,13 @@ def load(app):
           sa.id as activity_id,
           sa.name as activity_name,
           ss.created_at,
-          COUNT(wri.id) as review_items_count
+          ss.last_activity_at,
+          ss.ended_at,
+          ss.review_count
         FROM study_sessions ss
         JOIN groups g ON g.id = ss.group_id
         JOIN study_activities sa ON sa.id = ss.study_activity_id
-        LEFT JOIN word_review_items wri ON wri.study_session_id = ss.id
         WHERE ss.id = ?
-        GROUP BY ss.id
       ''', (id,))
       
       session = cursor.fetchone()
@@ -96,6 +132,8 @@ def load(app):
       # Get pagination parameters
       page = request.args.get('page', 1, type=int)
       per_page = request.args.get('per_page', 10, type=int)
+      if per_page < 1:
+        return jsonify({"error": "per_page must be at least 1"}), 400
       offset = (page - 1) * per_page
 
       # Get the words reviewed in this session with their review status
@@ -125,16 +163,7 @@ def load(app):
       total_count = cursor.fetchone()['count']
 
       return jsonify({
-        'session': {
-          'id': session['id'],
-          'group_id': session['group_id'],
-          'group_name': session['group_name'],
-          'activity_id': session['activity_id'],
-          'activity_name': session['activity_name'],
-          'start_time': session['created_at'],
-          'end_time': session['created_at'],  # For now, just use the same time
-          'review_items_count': session['review_items_count']
-        },
+        'session': format_session(session),
         'words': [{
           'id': word['id'],
           'kanji': word['kanji'],
@@ -151,7 +180,144 @@ def load(app):
     except Exception as e:
       return jsonify({"error": str(e)}), 500
 
-  # todo POST /study_sessions/:id/review
+  # Body: {"reviews": [{"word_id": 1, "is_correct": true}, ...], "end_session": false}
+  # An Idempotency-Key header (or "idempotency_key" in the body) makes retries safe:
+  # a key that was already used for this session is acknowledged without writing again.
+  # "end_session": true records the session's end time (reviews may then be empty).
+  # With REVIEW_WRITE_BEHIND on, validated submissions are queued and written in
+  # batches (202 Accepted); a full queue answers 503 with Retry-After.
+  @app.route('/api/study-sessions/<int:id>/review', methods=['POST'])
+  @cross_origin()
+  def submit_study_session_review(id):
+    try:
+      data = request.get_json(silent=True) or {}
+      reviews = data.get('reviews')
+      idempotency_key = request.headers.get('Idempotency-Key') or data.get('idempotency_key')
+      end_session = data.get('end_session', False)
+
+      if not isinstance(end_session, bool):
+        return jsonify({"error": "end_session must be a boolean"}), 400
+      if not isinstance(reviews, list) or not (reviews or end_session):
+        return jsonify({"error": "reviews must be a non-empty list"}), 400
+      if len(reviews) > MAX_REVIEWS_PER_SUBMISSION:
+        return jsonify({"error": f"At most {MAX_REVIEWS_PER_SUBMISSION} reviews per submission"}), 400
+      for review in reviews:
+        if (not isinstance(review, dict)
+            or type(review.get('word_id')) is not int
+            or not isinstance(review.get('is_correct'), bool)):
+          return jsonify({"error": "Each review needs an integer word_id and a boolean is_correct"}), 400
+
+      # Buffered submissions only read here; the buffer's flush thread writes them
+      buffer = getattr(app, 'review_buffer', None)
+      if buffer:
+        app.db.use_readers()
+      cursor = app.db.cursor()
+
+      cursor.execute('SELECT id FROM study_sessions WHERE id = ?', (id,))
+      if not cursor.fetchone():
+        return jsonify({"error": "Study session not found"}), 404
+
+      if idempotency_key:
+        cursor.execute('''
+          SELECT study_session_id, reviews_count
+          FROM review_submissions
+          WHERE idempotency_key = ?
+        ''', (idempotency_key,))
+        submission = cursor.fetchone()
+        if submission:
+          if submission['study_session_id'] != id:
+            return jsonify({"error": "Idempotency key was already used for another session"}), 409
+          return jsonify({
+            "study_session_id": id,
+            "reviews_count": submission['reviews_count'],
+            "replayed": True
+          }), 200
+
+      if idempotency_key and buffer:
+        queued_for = buffer.pending(idempotency_key, g.get('learner_id'))
+        if queued_for is not None:
+          if queued_for != id:
+            return jsonify({"error": "Idempotency key was already used for another session"}), 409
+          return jsonify({
+            "study_session_id": id,
+            "reviews_count": len(reviews),
+            "replayed": True,
+            "queued": True
+          }), 202
+
+      word_ids = json.dumps(sorted({review['word_id'] for review in reviews}))
+      cursor.execute('''
+        SELECT value FROM json_each(?)
+        WHERE value NOT IN (SELECT id FROM words)
+      ''', (word_ids,))
+      unknown = [row[0] for row in cursor.fetchall()]
+      if unknown:
+        return jsonify({"error": f"Unknown word_id(s): {unknown}"}), 400
+
+      if buffer:
+        try:
+          buffer.put(id, reviews, idempotency_key, end_session, g.get('learner_id'))
+        except BufferFull as e:
+          response = jsonify({"error": str(e)})
+          response.headers['Retry-After'] = '1'
+          return response, 503
+        return jsonify({
+          "study_session_id": id,
+          "reviews_count": len(reviews),
+          "replayed": False,
+          "queued": True
+        }), 202
+
+      # One transaction: the idempotency record, every review item and (through
+      # the word_review_items triggers) the word_reviews and study_sessions counters
+      try:
+        if idempotency_key:
+          cursor.execute('''
+            INSERT INTO review_submissions (idempotency_key, study_session_id, reviews_count)
+            VALUES (?, ?, ?)
+          ''', (idempotency_key, id, len(reviews)))
+        cursor.executemany('''
+          INSERT INTO word_review_items (word_id, study_session_id, correct)
+          VALUES (?, ?, ?)
+        ''', [(review['word_id'], id, review['is_correct']) for review in reviews])
+        if end_session:
+          cursor.execute('''
+            UPDATE study_sessions SET ended_at = COALESCE(ended_at, CURRENT_TIMESTAMP)
+            WHERE id = ?
+          ''', (id,))
+        app.db.commit()
+      except sqlite3.IntegrityError:
+        # Nothing of ours was written. It's a replay only if a concurrent retry
+        # claimed the key first; any other constraint failure is an error.
+        app.db.rollback()
+        submission = None
+        if idempotency_key:
+          cursor.execute('''
+            SELECT study_session_id, reviews_count
+            FROM review_submissions
+            WHERE idempotency_key = ?
+          ''', (idempotency_key,))
+          submission = cursor.fetchone()
+        if not submission:
+          raise
+        if submission['study_session_id'] != id:
+          return jsonify({"error": "Idempotency key was already used for another session"}), 409
+        return jsonify({
+          "study_session_id": id,
+          "reviews_count": submission['reviews_count'],
+          "replayed": True
+        }), 200
+      except Exception:
+        app.db.rollback()
+        raise
+
+      return jsonify({
+        "study_session_id": id,
+        "reviews_count": len(reviews),
+        "replayed": False
+      }), 201
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
 
   @app.route('/api/study-sessions/reset', methods=['POST'])
   @cross_origin()
@@ -2,14 +2,106 @@ from flask import request, jsonify, g
 from flask_cors import cross_origin
 import json
 
+from lib.pagination import InvalidCursor, decode_cursor, seek_clause, keyset_page
+from lib.http_cache import conditional
+
+# Sort and tie-break columns of the word listings (words w JOIN word_reviews r).
+# Each pair is the key of an index from migration 0012, so pages are index walks.
+WORD_LIST_SORTS = {
+  'kanji': ('w.kanji', 'w.id'),
+  'romaji': ('w.romaji', 'w.id'),
+  'english': ('w.english', 'w.id'),
+  'correct_count': ('r.correct_count', 'r.word_id'),
+  'wrong_count': ('r.wrong_count', 'r.word_id')
+}
+
+# FTS5 table behind each /words/search mode (sql/migrations/0007_words_fts.sql)
+SEARCH_TABLES = {
+  'prefix': 'words_fts',
+  'substring': 'words_fts_trigram'
+}
+
+# Build an FTS5 MATCH expression from search terms. Terms are always quoted so
+# FTS syntax in user input is never interpreted; prefix mode adds a trailing *.
+def fts_query(terms, mode):
+  suffix = '*' if mode == 'prefix' else ''
+  return ' '.join('"' + term.replace('"', '""') + '"' + suffix for term in terms)
+
+def format_word(word):
+  return {
+    "id": word["id"],
+    "kanji": word["kanji"],
+    "romaji": word["romaji"],
+    "english": word["english"],
+    "correct_count": word["correct_count"],
+    "wrong_count": word["wrong_count"]
+  }
+
+# Most ids one GET /words?ids= request may ask for
+MAX_BATCH_IDS = 500
+
+# SQLite integers are signed 64-bit
+MAX_SQLITE_INTEGER = 2 ** 63 - 1
+
+# The distinct ids of ids=1,2,3 in order; ValueError unless each one is an
+# integer SQLite can hold
+def parse_word_ids(ids):
+  word_ids = list(dict.fromkeys(int(word_id) for word_id in ids.split(',') if word_id.strip()))
+  if any(not -MAX_SQLITE_INTEGER - 1 <= word_id <= MAX_SQLITE_INTEGER for word_id in word_ids):
+    raise ValueError('ids must be 64-bit integers')
+  return word_ids
+
+# Words with their groups for the given ids, in the same order (unknown ids are
+# skipped). SQLite builds each word's groups as a JSON array, so group names
+# come back intact whatever characters they contain.
+def fetch_words(cursor, ids):
+  cursor.execute('''
+    SELECT w.id, w.kanji, w.romaji, w.english,
+        COALESCE(r.correct_count, 0) AS correct_count,
+        COALESCE(r.wrong_count, 0) AS wrong_count,
+        (
+          SELECT json_group_array(json_object('id', g.id, 'name', g.name))
+          FROM word_groups wg
+          JOIN groups g ON g.id = wg.group_id
+          WHERE wg.word_id = w.id
+        ) AS groups
+    FROM json_each(?) ids
+    JOIN words w ON w.id = ids.value
+    LEFT JOIN word_reviews r ON r.word_id = w.id
+  ''', (json.dumps(ids),))
+  found = {word['id']: dict(format_word(word), groups=json.loads(word['groups'])) for word in cursor.fetchall()}
+  return [found[word_id] for word_id in ids if word_id in found]
+
 def load(app):
   # Endpoint: GET /words with pagination (50 words per page)
+  # Pass cursor= (empty for the first page) to page by keyset instead of offset;
+  # the response then carries next_cursor instead of page totals.
+  # Pass ids=1,2,3 (at most MAX_BATCH_IDS) to fetch those words, with their
+  # groups, in one request: {"words": [...], "missing": [ids not found]}.
   @app.route('/words', methods=['GET'])
   @cross_origin()
+  @conditional('words', 'word_reviews', 'word_review_items', 'word_groups', 'groups')
   def get_words():
     try:
       cursor = app.db.cursor()
 
+      ids = request.args.get('ids')
+      if ids is not None:
+        try:
+          word_ids = parse_word_ids(ids)
+        except ValueError:
+          return jsonify({"error": "ids must be a comma-separated list of word ids"}), 400
+        if not word_ids:
+          return jsonify({"error": "ids must name at least one word"}), 400
+        if len(word_ids) > MAX_BATCH_IDS:
+          return jsonify({"error": f"At most {MAX_BATCH_IDS} ids per request"}), 400
+        words = fetch_words(cursor, word_ids)
+        found = {word['id'] for word in words}
+        return jsonify({
+          "words": words,
+          "missing": [word_id for word_id in word_ids if word_id not in found]
+        })
+
       # Get the current page number from query parameters (default is 1)
       page = int(request.args.get('page', 1))
       # Ensure page number is positive
@@ -28,14 +120,36 @@ def load(app):
       if order not in ['asc', 'desc']:
         order = 'asc'
 
+      sort_expression, id_expression = WORD_LIST_SORTS[sort_by]
+      page_cursor = request.args.get('cursor')
+
+      # Every word has a word_reviews row (migration 0012; a learner's shard gets
+      # rows for new words from ShardRouter.refresh), so this is an inner join
+      if page_cursor is not None:
+        seek = decode_cursor(page_cursor, sort_by, order)
+        where = 'WHERE ' + seek_clause(sort_expression, id_expression, order) if seek else ''
+        cursor.execute(f'''
+          SELECT w.id, w.kanji, w.romaji, w.english, r.correct_count, r.wrong_count,
+              {sort_expression} AS sort_key
+          FROM words w
+          JOIN word_reviews r ON w.id = r.word_id
+          {where}
+          ORDER BY {sort_expression} {order}, {id_expression} {order}
+          LIMIT ?
+        ''', (*(seek or ()), words_per_page + 1))
+
+        words, next_cursor = keyset_page(cursor.fetchall(), words_per_page, sort_by, order)
+        return jsonify({
+          "words": [format_word(word) for word in words],
+          "next_cursor": next_cursor
+        })
+
       # Query to fetch words with sorting
       cursor.execute(f'''
-        SELECT w.id, w.kanji, w.romaji, w.english, 
-            COALESCE(r.correct_count, 0) AS correct_count,
-            COALESCE(r.wrong_count, 0) AS wrong_count
+        SELECT w.id, w.kanji, w.romaji, w.english, r.correct_count, r.wrong_count
         FROM words w
-        LEFT JOIN word_reviews r ON w.id = r.word_id
-        ORDER BY {sort_by} {order}
+        JOIN word_reviews r ON w.id = r.word_id
+        ORDER BY {sort_expression} {order}, {id_expression} {order}
         LIMIT ? OFFSET ?
       ''', (words_per_page, offset))
 
@@ -47,16 +161,7 @@ def load(app):
       total_pages = (total_words + words_per_page - 1) // words_per_page
 
       # Format the response
-      words_data = []
-      for word in words:
-        words_data.append({
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"]
-        })
+      words_data = [format_word(word) for word in words]
 
       return jsonify({
         "words": words_data,
@@ -65,58 +170,74 @@ def load(app):
         "total_words": total_words
       })
 
+    except InvalidCursor as e:
+      return jsonify({"error": str(e)}), 400
     except Exception as e:
       return jsonify({"error": str(e)}), 500
-    finally:
-      app.db.close()
 
-  # Endpoint: GET /words/:id to get a single word with its details
-  @app.route('/words/<int:word_id>', methods=['GET'])
+  # Endpoint: GET /words/search?q=&mode=prefix|substring&limit=&cursor=
+  # prefix (default) matches words starting with each term; substring matches
+  # anywhere inside kanji/romaji/english (terms of 3+ characters). Results are
+  # ranked by bm25 and paged with next_cursor.
+  @app.route('/words/search', methods=['GET'])
   @cross_origin()
-  def get_word(word_id):
+  @conditional('words', 'word_reviews', 'word_review_items')
+  def search_words():
     try:
+      q = request.args.get('q', '').strip()
+      mode = request.args.get('mode', 'prefix')
+      limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+
+      if not q:
+        return jsonify({"error": "q is required"}), 400
+      if mode not in SEARCH_TABLES:
+        return jsonify({"error": "mode must be 'prefix' or 'substring'"}), 400
+      terms = q.split()
+      if mode == 'substring' and any(len(term) < 3 for term in terms):
+        return jsonify({"error": "Substring search needs at least 3 characters per term"}), 400
+
+      table = SEARCH_TABLES[mode]
+      seek = decode_cursor(request.args.get('cursor'), mode, q)
+      seek_sql = 'AND ' + seek_clause(f'{table}.rank', f'{table}.rowid', 'asc') if seek else ''
+
       cursor = app.db.cursor()
-      
-      # Query to fetch the word and its details
-      cursor.execute('''
+      cursor.execute(f'''
         SELECT w.id, w.kanji, w.romaji, w.english,
-               COALESCE(r.correct_count, 0) AS correct_count,
-               COALESCE(r.wrong_count, 0) AS wrong_count,
-               GROUP_CONCAT(DISTINCT g.id || '::' || g.name) as groups
-        FROM words w
+            COALESCE(r.correct_count, 0) AS correct_count,
+            COALESCE(r.wrong_count, 0) AS wrong_count,
+            {table}.rank AS sort_key
+        FROM {table}
+        JOIN words w ON w.id = {table}.rowid
         LEFT JOIN word_reviews r ON w.id = r.word_id
-        LEFT JOIN word_groups wg ON w.id = wg.word_id
-        LEFT JOIN groups g ON wg.group_id = g.id
-        WHERE w.id = ?
-        GROUP BY w.id
-      ''', (word_id,))
-      
-      word = cursor.fetchone()
-      
-      if not word:
-        return jsonify({"error": "Word not found"}), 404
-      
-      # Parse the groups string into a list of group objects
-      groups = []
-      if word["groups"]:
-        for group_str in word["groups"].split(','):
-          group_id, group_name = group_str.split('::')
-          groups.append({
-            "id": int(group_id),
-            "name": group_name
-          })
-      
+        WHERE {table} MATCH ? {seek_sql}
+        ORDER BY {table}.rank, {table}.rowid
+        LIMIT ?
+      ''', (fts_query(terms, mode), *(seek or ()), limit + 1))
+
+      # Cursors are bound to the mode and query they were issued for
+      words, next_cursor = keyset_page(cursor.fetchall(), limit, mode, q)
       return jsonify({
-        "word": {
-          "id": word["id"],
-          "kanji": word["kanji"],
-          "romaji": word["romaji"],
-          "english": word["english"],
-          "correct_count": word["correct_count"],
-          "wrong_count": word["wrong_count"],
-          "groups": groups
-        }
+        "words": [format_word(word) for word in words],
+        "next_cursor": next_cursor
       })
-      
+    except InvalidCursor as e:
+      return jsonify({"error": str(e)}), 400
+    except Exception as e:
+      return jsonify({"error": str(e)}), 500
+
+  # Endpoint: GET /words/:id to get a single word with its details
+  @app.route('/words/<int:word_id>', methods=['GET'])
+  @cross_origin()
+  @conditional('words', 'word_reviews', 'word_review_items', 'word_groups', 'groups')
+  def get_word(word_id):
+    try:
+      cursor = app.db.cursor()
+
+      words = fetch_words(cursor, [word_id])
+      if not words:
+        return jsonify({"error": "Word not found"}), 404
+
+      return jsonify({"word": words[0]})
+
     except Exception as e:
       return jsonify({"error": str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,18 @@
+-- word_groups had no key at all, so every group -> words lookup scanned the whole table.
+-- SQLite can't add a primary key in place, so rebuild the table with a composite key.
+CREATE TABLE word_groups_new (
+  group_id INTEGER NOT NULL,
+  word_id INTEGER NOT NULL,
+  PRIMARY KEY (group_id, word_id),
+  FOREIGN KEY (word_id) REFERENCES words(id),
+  FOREIGN KEY (group_id) REFERENCES groups(id)
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO word_groups_new (group_id, word_id)
+SELECT group_id, word_id FROM word_groups;
+
+DROP TABLE word_groups;
+ALTER TABLE word_groups_new RENAME TO word_groups;
+
+-- Reverse direction for word -> groups lookups (GET /words/:id)
+CREATE INDEX IF NOT EXISTS idx_word_groups_word_id ON word_groups (word_id, group_id);
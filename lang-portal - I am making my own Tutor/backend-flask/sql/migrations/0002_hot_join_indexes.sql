@@ -0,0 +1,22 @@
+-- Covering index for per-session aggregates (review counts, correct/wrong, last activity)
+CREATE INDEX IF NOT EXISTS idx_word_review_items_session
+  ON word_review_items (study_session_id, word_id, correct, created_at);
+
+-- Covering index for per-word aggregates (dashboard word stats)
+CREATE INDEX IF NOT EXISTS idx_word_review_items_word
+  ON word_review_items (word_id, created_at, correct);
+
+-- Session listings filtered by group or activity and ordered by time. Each one
+-- carries the other foreign key so session counts never touch the table.
+CREATE INDEX IF NOT EXISTS idx_study_sessions_group
+  ON study_sessions (group_id, created_at, study_activity_id);
+
+CREATE INDEX IF NOT EXISTS idx_study_sessions_activity
+  ON study_sessions (study_activity_id, created_at, group_id);
+
+CREATE INDEX IF NOT EXISTS idx_study_sessions_created_at
+  ON study_sessions (created_at);
+
+-- One counter row per word, joined from every word listing
+CREATE UNIQUE INDEX IF NOT EXISTS idx_word_reviews_word_id
+  ON word_reviews (word_id);
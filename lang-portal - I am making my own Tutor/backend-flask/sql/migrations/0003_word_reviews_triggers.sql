@@ -0,0 +1,35 @@
+-- Keep the per-word counters in word_reviews in step with word_review_items,
+-- so word listings read one row per word instead of re-aggregating reviews.
+-- Relies on the unique index on word_reviews(word_id) from 0002.
+CREATE TRIGGER IF NOT EXISTS word_review_items_after_insert
+AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+  VALUES (NEW.word_id, NEW.correct = 1, NEW.correct = 0, NEW.created_at)
+  ON CONFLICT (word_id) DO UPDATE SET
+    correct_count = correct_count + excluded.correct_count,
+    wrong_count = wrong_count + excluded.wrong_count,
+    last_reviewed = CASE
+      WHEN last_reviewed IS NULL OR excluded.last_reviewed > last_reviewed THEN excluded.last_reviewed
+      ELSE last_reviewed
+    END;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_review_items_after_delete
+AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE word_reviews SET
+    correct_count = correct_count - (OLD.correct = 1),
+    wrong_count = wrong_count - (OLD.correct = 0),
+    last_reviewed = (
+      SELECT MAX(created_at) FROM word_review_items WHERE word_id = OLD.word_id
+    )
+  WHERE word_id = OLD.word_id;
+END;
+
+-- Counters for reviews recorded before the triggers existed
+DELETE FROM word_reviews;
+INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+SELECT word_id, SUM(correct = 1), SUM(correct = 0), MAX(created_at)
+FROM word_review_items
+GROUP BY word_id;
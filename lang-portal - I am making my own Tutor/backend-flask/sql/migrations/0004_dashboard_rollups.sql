@@ -0,0 +1,141 @@
+-- Rollups behind GET /dashboard/stats, kept current by triggers so the endpoint
+-- never aggregates raw review history.
+
+-- One row per study day and group
+CREATE TABLE IF NOT EXISTS daily_stats (
+  study_date TEXT NOT NULL,
+  group_id INTEGER NOT NULL,
+  sessions_count INTEGER NOT NULL DEFAULT 0,
+  review_count INTEGER NOT NULL DEFAULT 0,
+  correct_count INTEGER NOT NULL DEFAULT 0,
+  PRIMARY KEY (study_date, group_id)
+) WITHOUT ROWID;
+
+-- Single row of word-level totals derived from word_reviews. A word is mastered
+-- after at least 5 attempts with a success rate of 80% or more.
+CREATE TABLE IF NOT EXISTS word_mastery (
+  id INTEGER PRIMARY KEY CHECK (id = 1),
+  words_studied INTEGER NOT NULL DEFAULT 0,
+  mastered_words INTEGER NOT NULL DEFAULT 0
+);
+
+INSERT OR IGNORE INTO word_mastery (id) VALUES (1);
+
+CREATE TRIGGER IF NOT EXISTS daily_stats_session_insert
+AFTER INSERT ON study_sessions
+BEGIN
+  INSERT INTO daily_stats (study_date, group_id, sessions_count)
+  VALUES (date(NEW.created_at), NEW.group_id, 1)
+  ON CONFLICT (study_date, group_id) DO UPDATE SET sessions_count = sessions_count + 1;
+END;
+
+-- Reviews left behind by a deleted session stop counting as well
+CREATE TRIGGER IF NOT EXISTS daily_stats_session_delete
+AFTER DELETE ON study_sessions
+BEGIN
+  UPDATE daily_stats SET sessions_count = sessions_count - 1
+  WHERE study_date = date(OLD.created_at) AND group_id = OLD.group_id;
+
+  UPDATE daily_stats SET
+    review_count = review_count - (
+      SELECT COUNT(*) FROM word_review_items
+      WHERE study_session_id = OLD.id AND date(created_at) = daily_stats.study_date
+    ),
+    correct_count = correct_count - (
+      SELECT COUNT(*) FROM word_review_items
+      WHERE study_session_id = OLD.id AND date(created_at) = daily_stats.study_date AND correct = 1
+    )
+  WHERE group_id = OLD.group_id
+    AND study_date IN (SELECT date(created_at) FROM word_review_items WHERE study_session_id = OLD.id);
+
+  DELETE FROM daily_stats
+  WHERE group_id = OLD.group_id AND sessions_count <= 0 AND review_count <= 0;
+END;
+
+-- Reviews count towards the group of their session; reviews whose session is
+-- gone are ignored, like the joins the dashboard used to run
+CREATE TRIGGER IF NOT EXISTS daily_stats_review_insert
+AFTER INSERT ON word_review_items
+BEGIN
+  INSERT INTO daily_stats (study_date, group_id, review_count, correct_count)
+  SELECT date(NEW.created_at), group_id, 1, NEW.correct = 1
+  FROM study_sessions WHERE id = NEW.study_session_id
+  ON CONFLICT (study_date, group_id) DO UPDATE SET
+    review_count = review_count + 1,
+    correct_count = correct_count + excluded.correct_count;
+END;
+
+CREATE TRIGGER IF NOT EXISTS daily_stats_review_delete
+AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE daily_stats SET
+    review_count = review_count - 1,
+    correct_count = correct_count - (OLD.correct = 1)
+  WHERE study_date = date(OLD.created_at)
+    AND group_id = (SELECT group_id FROM study_sessions WHERE id = OLD.study_session_id);
+
+  DELETE FROM daily_stats
+  WHERE study_date = date(OLD.created_at)
+    AND group_id = (SELECT group_id FROM study_sessions WHERE id = OLD.study_session_id)
+    AND sessions_count <= 0 AND review_count <= 0;
+END;
+
+-- word_mastery follows every change to the per-word counters
+CREATE TRIGGER IF NOT EXISTS word_mastery_insert
+AFTER INSERT ON word_reviews
+BEGIN
+  UPDATE word_mastery SET
+    words_studied = words_studied + (NEW.correct_count + NEW.wrong_count > 0),
+    mastered_words = mastered_words
+      + (NEW.correct_count + NEW.wrong_count >= 5 AND NEW.correct_count * 5 >= (NEW.correct_count + NEW.wrong_count) * 4)
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_mastery_update
+AFTER UPDATE OF correct_count, wrong_count ON word_reviews
+BEGIN
+  UPDATE word_mastery SET
+    words_studied = words_studied
+      + (NEW.correct_count + NEW.wrong_count > 0)
+      - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words
+      + (NEW.correct_count + NEW.wrong_count >= 5 AND NEW.correct_count * 5 >= (NEW.correct_count + NEW.wrong_count) * 4)
+      - (OLD.correct_count + OLD.wrong_count >= 5 AND OLD.correct_count * 5 >= (OLD.correct_count + OLD.wrong_count) * 4)
+  WHERE id = 1;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_mastery_delete
+AFTER DELETE ON word_reviews
+BEGIN
+  UPDATE word_mastery SET
+    words_studied = words_studied - (OLD.correct_count + OLD.wrong_count > 0),
+    mastered_words = mastered_words
+      - (OLD.correct_count + OLD.wrong_count >= 5 AND OLD.correct_count * 5 >= (OLD.correct_count + OLD.wrong_count) * 4)
+  WHERE id = 1;
+END;
+
+-- Backfill from existing history (same as sql/rebuild/daily_stats.sql and word_mastery.sql)
+DELETE FROM daily_stats;
+
+INSERT INTO daily_stats (study_date, group_id, sessions_count)
+SELECT date(created_at), group_id, COUNT(*)
+FROM study_sessions
+GROUP BY date(created_at), group_id;
+
+INSERT INTO daily_stats (study_date, group_id, review_count, correct_count)
+SELECT date(wri.created_at), ss.group_id, COUNT(*), SUM(wri.correct = 1)
+FROM study_sessions ss
+CROSS JOIN word_review_items wri ON wri.study_session_id = ss.id
+WHERE true  -- required before an upsert clause
+GROUP BY date(wri.created_at), ss.group_id
+ON CONFLICT (study_date, group_id) DO UPDATE SET
+  review_count = excluded.review_count,
+  correct_count = excluded.correct_count;
+
+INSERT OR REPLACE INTO word_mastery (id, words_studied, mastered_words)
+SELECT
+  1,
+  COUNT(*),
+  COALESCE(SUM(correct_count + wrong_count >= 5 AND correct_count * 5 >= (correct_count + wrong_count) * 4), 0)
+FROM word_reviews
+WHERE correct_count + wrong_count > 0;
@@ -0,0 +1,10 @@
+-- Idempotency ledger for POST /api/study-sessions/:id/review. A retried
+-- submission with the same key is answered from here instead of being
+-- written twice.
+CREATE TABLE IF NOT EXISTS review_submissions (
+  idempotency_key TEXT PRIMARY KEY,
+  study_session_id INTEGER NOT NULL,
+  reviews_count INTEGER NOT NULL,
+  created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+  FOREIGN KEY (study_session_id) REFERENCES study_sessions(id)
+);
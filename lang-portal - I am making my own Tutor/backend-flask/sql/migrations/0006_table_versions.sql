@@ -0,0 +1,19 @@
+-- Write generation per table, bumped by lib/db.py in the same transaction as
+-- every commit that wrote to the table. GET routes derive their ETags from it.
+CREATE TABLE IF NOT EXISTS table_versions (
+  name TEXT PRIMARY KEY,
+  version INTEGER NOT NULL DEFAULT 0,
+  updated_at TEXT NOT NULL DEFAULT (strftime('%Y-%m-%d %H:%M:%f', 'now'))
+) WITHOUT ROWID;
+
+INSERT OR IGNORE INTO table_versions (name, version)
+VALUES
+  ('words', 1),
+  ('groups', 1),
+  ('word_groups', 1),
+  ('word_reviews', 1),
+  ('word_review_items', 1),
+  ('study_sessions', 1),
+  ('study_activities', 1),
+  ('daily_stats', 1),
+  ('word_mastery', 1);
@@ -0,0 +1,40 @@
+-- Per-session activity kept on study_sessions itself, so session listings and
+-- the dashboard read it instead of aggregating word_review_items.
+--   last_activity_at  time of the session's latest review (NULL until reviewed)
+--   ended_at          set when the learner finishes the session (see the
+--                     end_session flag of POST /api/study-sessions/<id>/review)
+ALTER TABLE study_sessions ADD COLUMN last_activity_at DATETIME;
+ALTER TABLE study_sessions ADD COLUMN ended_at DATETIME;
+ALTER TABLE study_sessions ADD COLUMN review_count INTEGER NOT NULL DEFAULT 0;
+ALTER TABLE study_sessions ADD COLUMN correct_count INTEGER NOT NULL DEFAULT 0;
+
+CREATE TRIGGER IF NOT EXISTS study_sessions_review_insert
+AFTER INSERT ON word_review_items
+BEGIN
+  UPDATE study_sessions SET
+    review_count = review_count + 1,
+    correct_count = correct_count + (NEW.correct = 1),
+    last_activity_at = CASE
+      WHEN last_activity_at IS NULL OR NEW.created_at > last_activity_at THEN NEW.created_at
+      ELSE last_activity_at
+    END
+  WHERE id = NEW.study_session_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS study_sessions_review_delete
+AFTER DELETE ON word_review_items
+BEGIN
+  UPDATE study_sessions SET
+    review_count = review_count - 1,
+    correct_count = correct_count - (OLD.correct = 1),
+    last_activity_at = (
+      SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = OLD.study_session_id
+    )
+  WHERE id = OLD.study_session_id;
+END;
+
+-- Backfill existing sessions
+UPDATE study_sessions SET
+  review_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id),
+  correct_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id AND correct = 1),
+  last_activity_at = (SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = study_sessions.id);
@@ -0,0 +1,121 @@
+-- Spaced-repetition schedule (SM-2 style) for every word of every group. Study
+-- activities take their next words from GET /groups/<id>/due, which reads the
+-- (group_id, due_at) index.
+--
+-- A correct review advances the word: repetitions + 1, interval 1 day, then 6
+-- days, then the previous interval times ease (at most 365 days, which also
+-- keeps due_at inside SQLite's date range); ease grows by 0.1. A wrong review
+-- is a lapse: repetitions and interval reset, ease drops by 0.2 (never below
+-- 1.3) and the word is due again 10 minutes later. Words never reviewed are due
+-- from the moment they join the group.
+CREATE TABLE IF NOT EXISTS word_schedules (
+  group_id INTEGER NOT NULL,
+  word_id INTEGER NOT NULL,
+  ease REAL NOT NULL DEFAULT 2.5,
+  interval_days INTEGER NOT NULL DEFAULT 0,
+  repetitions INTEGER NOT NULL DEFAULT 0,
+  due_at DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  reviewed_at DATETIME,
+  PRIMARY KEY (group_id, word_id),
+  FOREIGN KEY (group_id) REFERENCES groups(id),
+  FOREIGN KEY (word_id) REFERENCES words(id)
+) WITHOUT ROWID;
+
+CREATE INDEX IF NOT EXISTS idx_word_schedules_due ON word_schedules(group_id, due_at);
+
+CREATE TRIGGER IF NOT EXISTS word_schedules_group_insert
+AFTER INSERT ON word_groups
+BEGIN
+  INSERT INTO word_schedules (group_id, word_id) VALUES (NEW.group_id, NEW.word_id)
+  ON CONFLICT (group_id, word_id) DO NOTHING;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_schedules_group_delete
+AFTER DELETE ON word_groups
+BEGIN
+  DELETE FROM word_schedules WHERE group_id = OLD.group_id AND word_id = OLD.word_id;
+END;
+
+-- Reviews move the word's schedule in the group of their session. Deleting a
+-- review doesn't rewind the schedule; 'invoke rebuild --name word_schedules'
+-- replays the remaining history instead.
+CREATE TRIGGER IF NOT EXISTS word_schedules_review_insert
+AFTER INSERT ON word_review_items
+BEGIN
+  UPDATE word_schedules SET
+    repetitions = CASE WHEN NEW.correct = 1 THEN repetitions + 1 ELSE 0 END,
+    interval_days = CASE
+      WHEN NEW.correct = 0 THEN 0
+      WHEN repetitions = 0 THEN 1
+      WHEN repetitions = 1 THEN 6
+      ELSE MIN(365, CAST(ROUND(interval_days * ease) AS INTEGER))
+    END,
+    ease = CASE WHEN NEW.correct = 1 THEN ease + 0.1 ELSE MAX(1.3, ease - 0.2) END,
+    due_at = CASE
+      WHEN NEW.correct = 0 THEN datetime(NEW.created_at, '+10 minutes')
+      WHEN repetitions = 0 THEN datetime(NEW.created_at, '+1 days')
+      WHEN repetitions = 1 THEN datetime(NEW.created_at, '+6 days')
+      ELSE datetime(NEW.created_at, '+' || MIN(365, CAST(ROUND(interval_days * ease) AS INTEGER)) || ' days')
+    END,
+    reviewed_at = NEW.created_at
+  WHERE group_id = (SELECT group_id FROM study_sessions WHERE id = NEW.study_session_id)
+    AND word_id = NEW.word_id;
+END;
+
+-- Backfill: schedule every grouped word, then replay the review history
+INSERT INTO word_schedules (group_id, word_id)
+SELECT group_id, word_id FROM word_groups WHERE true
+ON CONFLICT (group_id, word_id) DO NOTHING;
+
+WITH RECURSIVE
+  history AS MATERIALIZED (
+    SELECT
+      ss.group_id,
+      wri.word_id,
+      wri.correct,
+      wri.created_at,
+      ROW_NUMBER() OVER (PARTITION BY ss.group_id, wri.word_id ORDER BY wri.created_at, wri.id) as n,
+      COUNT(*) OVER (PARTITION BY ss.group_id, wri.word_id) as total
+    FROM word_review_items wri
+    JOIN study_sessions ss ON ss.id = wri.study_session_id
+    JOIN word_groups wg ON wg.group_id = ss.group_id AND wg.word_id = wri.word_id
+  ),
+  -- Each step carries the word's review count, so the final state is the row
+  -- where n = total (no per-row MAX over the history)
+  replay (group_id, word_id, n, total, ease, interval_days, repetitions, due_at, reviewed_at) AS (
+    SELECT group_id, word_id, 0, total, 2.5, 0, 0, NULL, NULL
+    FROM history WHERE n = 1
+    UNION ALL
+    SELECT
+      r.group_id,
+      r.word_id,
+      h.n,
+      r.total,
+      CASE WHEN h.correct = 1 THEN r.ease + 0.1 ELSE MAX(1.3, r.ease - 0.2) END,
+      CASE
+        WHEN h.correct = 0 THEN 0
+        WHEN r.repetitions = 0 THEN 1
+        WHEN r.repetitions = 1 THEN 6
+        ELSE MIN(365, CAST(ROUND(r.interval_days * r.ease) AS INTEGER))
+      END,
+      CASE WHEN h.correct = 1 THEN r.repetitions + 1 ELSE 0 END,
+      CASE
+        WHEN h.correct = 0 THEN datetime(h.created_at, '+10 minutes')
+        WHEN r.repetitions = 0 THEN datetime(h.created_at, '+1 days')
+        WHEN r.repetitions = 1 THEN datetime(h.created_at, '+6 days')
+        ELSE datetime(h.created_at, '+' || MIN(365, CAST(ROUND(r.interval_days * r.ease) AS INTEGER)) || ' days')
+      END,
+      h.created_at
+    FROM replay r
+    JOIN history h ON h.group_id = r.group_id AND h.word_id = r.word_id AND h.n = r.n + 1
+  )
+UPDATE word_schedules SET
+  ease = latest.ease,
+  interval_days = latest.interval_days,
+  repetitions = latest.repetitions,
+  due_at = latest.due_at,
+  reviewed_at = latest.reviewed_at
+FROM (
+  SELECT * FROM replay WHERE n = total
+) latest
+WHERE word_schedules.group_id = latest.group_id AND word_schedules.word_id = latest.word_id;
@@ -0,0 +1,3 @@
+-- Review history in time order (GET /api/export/reviews?since=) as a range scan
+CREATE INDEX IF NOT EXISTS idx_word_review_items_created_at
+  ON word_review_items (created_at);
@@ -0,0 +1,26 @@
+-- groups.words_count follows word_groups, so GET /groups can sort by it without
+-- counting. 'invoke verify-words-count' reports drift, '--repair' fixes it.
+CREATE TRIGGER IF NOT EXISTS groups_words_count_insert
+AFTER INSERT ON word_groups
+BEGIN
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS groups_words_count_delete
+AFTER DELETE ON word_groups
+BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+END;
+
+CREATE TRIGGER IF NOT EXISTS groups_words_count_update
+AFTER UPDATE OF group_id ON word_groups
+WHEN NEW.group_id IS NOT OLD.group_id
+BEGIN
+  UPDATE groups SET words_count = words_count - 1 WHERE id = OLD.group_id;
+  UPDATE groups SET words_count = words_count + 1 WHERE id = NEW.group_id;
+END;
+
+-- Backfill: the column was nullable and only set by the importer
+UPDATE groups SET words_count = (
+  SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id
+);
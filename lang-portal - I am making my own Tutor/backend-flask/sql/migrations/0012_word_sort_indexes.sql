@@ -0,0 +1,35 @@
+-- GET /words sorts by any of kanji, romaji, english, correct_count or
+-- wrong_count and stops after one page. Each sort gets an index that already
+-- holds the rows in that order (ties broken by word id), so a page is an index
+-- walk instead of a sort of every word.
+CREATE INDEX IF NOT EXISTS idx_words_kanji ON words (kanji);
+CREATE INDEX IF NOT EXISTS idx_words_romaji ON words (romaji);
+CREATE INDEX IF NOT EXISTS idx_words_english ON words (english);
+
+CREATE INDEX IF NOT EXISTS idx_word_reviews_correct_count ON word_reviews (correct_count, word_id);
+CREATE INDEX IF NOT EXISTS idx_word_reviews_wrong_count ON word_reviews (wrong_count, word_id);
+
+-- The counter sorts walk word_reviews, so every word needs its row there even
+-- before its first review (no COALESCE over a LEFT JOIN). New words get a
+-- zeroed row; last_reviewed stays NULL until a review arrives.
+CREATE TRIGGER IF NOT EXISTS word_reviews_word_insert
+AFTER INSERT ON words
+BEGIN
+  INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+  VALUES (NEW.id, 0, 0, NULL)
+  ON CONFLICT (word_id) DO NOTHING;
+END;
+
+CREATE TRIGGER IF NOT EXISTS word_reviews_word_delete
+AFTER DELETE ON words
+BEGIN
+  DELETE FROM word_reviews WHERE word_id = OLD.id;
+END;
+
+-- Backfill the rows of words that were never reviewed
+INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+SELECT id, 0, 0, NULL FROM words WHERE true
+ON CONFLICT (word_id) DO NOTHING;
+
+UPDATE word_reviews SET correct_count = 0 WHERE correct_count IS NULL;
+UPDATE word_reviews SET wrong_count = 0 WHERE wrong_count IS NULL;
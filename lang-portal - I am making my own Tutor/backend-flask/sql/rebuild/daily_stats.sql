@@ -0,0 +1,17 @@
+-- Recompute the per-day, per-group study rollup from sessions and review items
+DELETE FROM daily_stats;
+
+INSERT INTO daily_stats (study_date, group_id, sessions_count)
+SELECT date(created_at), group_id, COUNT(*)
+FROM study_sessions
+GROUP BY date(created_at), group_id;
+
+INSERT INTO daily_stats (study_date, group_id, review_count, correct_count)
+SELECT date(wri.created_at), ss.group_id, COUNT(*), SUM(wri.correct = 1)
+FROM study_sessions ss
+CROSS JOIN word_review_items wri ON wri.study_session_id = ss.id
+WHERE true  -- required before an upsert clause
+GROUP BY date(wri.created_at), ss.group_id
+ON CONFLICT (study_date, group_id) DO UPDATE SET
+  review_count = excluded.review_count,
+  correct_count = excluded.correct_count;
@@ -0,0 +1,7 @@
+-- Recompute groups.words_count from word_groups (only rows that drifted)
+UPDATE groups SET words_count = (
+  SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id
+)
+WHERE words_count IS NOT (
+  SELECT COUNT(*) FROM word_groups WHERE group_id = groups.id
+);
@@ -0,0 +1,6 @@
+-- Recompute the per-session activity columns from the raw review items
+-- (ended_at is recorded by the app, not derived, and is left alone)
+UPDATE study_sessions SET
+  review_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id),
+  correct_count = (SELECT COUNT(*) FROM word_review_items WHERE study_session_id = study_sessions.id AND correct = 1),
+  last_activity_at = (SELECT MAX(created_at) FROM word_review_items WHERE study_session_id = study_sessions.id);
@@ -0,0 +1,8 @@
+-- Recompute the studied/mastered word totals from the per-word counters
+INSERT OR REPLACE INTO word_mastery (id, words_studied, mastered_words)
+SELECT
+  1,
+  COUNT(*),
+  COALESCE(SUM(correct_count + wrong_count >= 5 AND correct_count * 5 >= (correct_count + wrong_count) * 4), 0)
+FROM word_reviews
+WHERE correct_count + wrong_count > 0;
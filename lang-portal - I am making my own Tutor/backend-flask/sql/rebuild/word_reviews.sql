@@ -0,0 +1,9 @@
+-- Recompute every per-word counter from the raw review items (every word keeps
+-- a row, zeroed if it was never reviewed)
+DELETE FROM word_reviews;
+
+INSERT INTO word_reviews (word_id, correct_count, wrong_count, last_reviewed)
+SELECT w.id, COALESCE(SUM(i.correct = 1), 0), COALESCE(SUM(i.correct = 0), 0), MAX(i.created_at)
+FROM words w
+LEFT JOIN word_review_items i ON i.word_id = w.id
+GROUP BY w.id;
@@ -0,0 +1,59 @@
+-- Reschedule every grouped word from scratch by replaying its review history
+-- through the SM-2 rules of migration 0009
+DELETE FROM word_schedules;
+
+INSERT INTO word_schedules (group_id, word_id)
+SELECT group_id, word_id FROM word_groups;
+
+WITH RECURSIVE
+  history AS MATERIALIZED (
+    SELECT
+      ss.group_id,
+      wri.word_id,
+      wri.correct,
+      wri.created_at,
+      ROW_NUMBER() OVER (PARTITION BY ss.group_id, wri.word_id ORDER BY wri.created_at, wri.id) as n,
+      COUNT(*) OVER (PARTITION BY ss.group_id, wri.word_id) as total
+    FROM word_review_items wri
+    JOIN study_sessions ss ON ss.id = wri.study_session_id
+    JOIN word_groups wg ON wg.group_id = ss.group_id AND wg.word_id = wri.word_id
+  ),
+  -- Each step carries the word's review count, so the final state is the row
+  -- where n = total (no per-row MAX over the history)
+  replay (group_id, word_id, n, total, ease, interval_days, repetitions, due_at, reviewed_at) AS (
+    SELECT group_id, word_id, 0, total, 2.5, 0, 0, NULL, NULL
+    FROM history WHERE n = 1
+    UNION ALL
+    SELECT
+      r.group_id,
+      r.word_id,
+      h.n,
+      r.total,
+      CASE WHEN h.correct = 1 THEN r.ease + 0.1 ELSE MAX(1.3, r.ease - 0.2) END,
+      CASE
+        WHEN h.correct = 0 THEN 0
+        WHEN r.repetitions = 0 THEN 1
+        WHEN r.repetitions = 1 THEN 6
+        ELSE MIN(365, CAST(ROUND(r.interval_days * r.ease) AS INTEGER))
+      END,
+      CASE WHEN h.correct = 1 THEN r.repetitions + 1 ELSE 0 END,
+      CASE
+        WHEN h.correct = 0 THEN datetime(h.created_at, '+10 minutes')
+        WHEN r.repetitions = 0 THEN datetime(h.created_at, '+1 days')
+        WHEN r.repetitions = 1 THEN datetime(h.created_at, '+6 days')
+        ELSE datetime(h.created_at, '+' || MIN(365, CAST(ROUND(r.interval_days * r.ease) AS INTEGER)) || ' days')
+      END,
+      h.created_at
+    FROM replay r
+    JOIN history h ON h.group_id = r.group_id AND h.word_id = r.word_id AND h.n = r.n + 1
+  )
+UPDATE word_schedules SET
+  ease = latest.ease,
+  interval_days = latest.interval_days,
+  repetitions = latest.repetitions,
+  due_at = latest.due_at,
+  reviewed_at = latest.reviewed_at
+FROM (
+  SELECT * FROM replay WHERE n = total
+) latest
+WHERE word_schedules.group_id = latest.group_id AND word_schedules.word_id = latest.word_id;
@@ -0,0 +1,3 @@
+-- Re-index both full-text tables from the words table
+INSERT INTO words_fts (words_fts) VALUES ('rebuild');
+INSERT INTO words_fts_trigram (words_fts_trigram) VALUES ('rebuild');
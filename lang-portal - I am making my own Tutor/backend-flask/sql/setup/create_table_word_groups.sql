@@ -1,6 +1,7 @@
 CREATE TABLE IF NOT EXISTS word_groups (
-  word_id INTEGER NOT NULL,
   group_id INTEGER NOT NULL,
+  word_id INTEGER NOT NULL,
+  PRIMARY KEY (group_id, word_id),
   FOREIGN KEY (word_id) REFERENCES words(id),
   FOREIGN KEY (group_id) REFERENCES groups(id)
-);
\ No newline at end of file
+) WITHOUT ROWID;
@@ -4,6 +4,93 @@ from lib.db import db
 @task
 def init_db(c):
   from flask import Flask
+  from migrate import run_migrations
   app = Flask(__name__)
   db.init(app)
-  print("Database initialized successfully.")
\ No newline at end of file
+  run_migrations(db_path=db.database)
+  print("Database initialized successfully.")
+
+@task(help={
+  'group': 'Name of the group to create',
+  'path': 'JSON file containing an array of words',
+  'batch_size': 'Words per executemany batch'
+})
+def import_words(c, group, path, batch_size=5000):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    db.import_word_json(
+      cursor=db.cursor(),
+      group_name=group,
+      data_json_path=path,
+      batch_size=int(batch_size),
+      progress=lambda count: print(f"  {count} words imported...")
+    )
+
+@task
+def migrate(c):
+  from migrate import run_migrations
+  run_migrations(db_path=db.database)
+
+# Trigger-maintained tables that can be recomputed from raw data, in dependency order
+REBUILDS = ['word_reviews', 'word_mastery', 'daily_stats', 'words_fts', 'study_sessions', 'word_schedules', 'groups']
+
+@task(help={'name': "Table to rebuild (one of REBUILDS), or 'all'"})
+def rebuild(c, name='all'):
+  from flask import Flask
+  app = Flask(__name__)
+  names = REBUILDS if name == 'all' else [name]
+  with app.app_context():
+    for table in names:
+      db.rebuild(table)
+      print(f"Rebuilt {table}.")
+
+@task(help={'repair': 'Recompute the groups that drifted'})
+def verify_words_count(c, repair=False):
+  from flask import Flask
+  app = Flask(__name__)
+  with app.app_context():
+    drifted = db.verify_words_count()
+    for group_id, name, words_count, actual in drifted:
+      print(f"Group {group_id} ({name}): words_count {words_count}, actual {actual}")
+    if not drifted:
+      print("Every groups.words_count matches word_groups.")
+    elif repair:
+      db.rebuild('groups')
+      print(f"Repaired {len(drifted)} group(s).")
+    else:
+      raise SystemExit(f"{len(drifted)} group(s) drifted; run with --repair to fix them.")
+
+@task
+def check_query_plans(c):
+  from app import create_app
+  from migrate import run_migrations
+  from lib.query_plans import check_query_plans
+  failures = check_query_plans(create_app, run_migrations)
+  for sql, problems in failures.items():
+    print(' '.join(sql.split()))
+    for problem in problems:
+      print(f"  -> {problem}")
+  if failures:
+    raise SystemExit(f"{len(failures)} statement(s) scan a hot table.")
+  print("No full table scans found.")
+
+@task(help={'words': 'Number of words to generate', 'number': 'Indexed queries per timing run'})
+def benchmark_word_sorts(c, words=500000, number=20):
+  from app import create_app
+  from migrate import run_migrations
+  from lib.benchmarks import benchmark_word_sorts
+  results = benchmark_word_sorts(create_app, run_migrations, words=int(words), number=int(number))
+  print(f"{'sort_by':14} {'order':5} {'before ms':>10} {'after ms':>9}  plan")
+  for sort_by, order, legacy_ms, indexed_ms, plan in results:
+    print(f"{sort_by:14} {order:5} {legacy_ms:>10.1f} {indexed_ms:>9.3f}  {plan}")
+
+@task(help={'number': 'Serializations per timing run'})
+def benchmark_responses(c, number=2000):
+  from app import create_app
+  from migrate import run_migrations
+  from lib.benchmarks import benchmark_responses
+  results = benchmark_responses(create_app, run_migrations, number=int(number))
+  print(f"{'route':36} {'format':8} {'coding':9} {'bytes':>7} {'serialize µs':>13} {'compress µs':>12}")
+  for route, serializer, coding, size, serialize_us, compress_us in results:
+    print(f"{route:36} {serializer:8} {coding:9} {size:>7} {serialize_us:>13.1f} {compress_us:>12.1f}")
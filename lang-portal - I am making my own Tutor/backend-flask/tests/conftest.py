@@ -0,0 +1,25 @@
+import os
+
+import pytest
+
+from app import create_app
+from migrate import run_migrations
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Extra app config; override this fixture in a test module to change it
+@pytest.fixture
+def config():
+  return {}
+
+# A fresh seeded and fully migrated database per test (pytest-flask builds the
+# client fixture from this one)
+@pytest.fixture
+def app(tmp_path, monkeypatch, config):
+  monkeypatch.chdir(BACKEND_DIR)  # the seed paths are relative
+  database = str(tmp_path / 'words.db')
+  app = create_app({'DATABASE': database, 'TESTING': True, 'METRICS': False, **config})
+  app.db.init(app)
+  run_migrations(db_path=database)
+  yield app
+  app.db.dispose()
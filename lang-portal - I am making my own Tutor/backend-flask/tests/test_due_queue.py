@@ -0,0 +1,30 @@
+import sqlite3
+
+def due_ids(client, limit=20, group_id=1):
+  response = client.get(f'/groups/{group_id}/due?limit={limit}')
+  assert response.status_code == 200
+  return response.get_json()
+
+def test_popped_words_are_leased(client):
+  first = due_ids(client, limit=5)
+  second = due_ids(client, limit=5)
+  first_ids = [word['id'] for word in first['words']]
+  second_ids = [word['id'] for word in second['words']]
+  assert len(first_ids) == len(second_ids) == 5
+  assert not set(first_ids) & set(second_ids)
+
+def test_queue_runs_dry_until_leases_expire(app, client):
+  assert len(due_ids(client, limit=100)['words']) == 60
+  empty = due_ids(client, limit=100)
+  assert empty['words'] == []
+  assert empty['next_due_at'] is not None
+
+  # An expired lease makes the word due again
+  connection = sqlite3.connect(app.config['DATABASE'])
+  connection.execute("UPDATE word_schedules SET due_at = datetime('now', '-1 minutes') WHERE group_id = 1 AND word_id = 1")
+  connection.commit()
+  connection.close()
+  assert [word['id'] for word in due_ids(client)['words']] == [1]
+
+def test_unknown_group(client):
+  assert client.get('/groups/999/due').status_code == 404
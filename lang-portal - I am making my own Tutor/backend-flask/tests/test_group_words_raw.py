@@ -0,0 +1,51 @@
+from contextlib import contextmanager
+
+# pytest-flask runs every test inside a GET request context, which the Db
+# serves from read-only connections. Writes go through a POST context with its
+# own app context, so the writer is handed back when it ends.
+@contextmanager
+def writing(app):
+  with app.test_request_context(method='POST'), app.app_context():
+    yield
+
+def execute(app, sql, parameters=()):
+  with writing(app):
+    app.db.cursor().execute(sql, parameters)
+    app.db.commit()
+
+def etag(client, **headers):
+  response = client.get('/groups/1/words/raw', headers=headers)
+  assert response.status_code == 200
+  return response.headers['ETag']
+
+def test_other_groups_keep_the_etag(app, client):
+  before = etag(client)
+  execute(app, 'UPDATE groups SET name = ? WHERE id = 2', ('Renamed',))
+  execute(app, 'DELETE FROM word_groups WHERE group_id = 2 AND word_id = (SELECT MAX(word_id) FROM word_groups WHERE group_id = 2)')
+  assert etag(client) == before
+  assert client.get('/groups/1/words/raw', headers={'If-None-Match': before}).status_code == 304
+
+def test_membership_changes_the_etag(app, client):
+  before = etag(client)
+  execute(app, '''
+    INSERT INTO word_groups (group_id, word_id)
+    SELECT 1, MIN(word_id) FROM word_groups WHERE group_id = 2
+  ''')
+  assert etag(client) != before
+
+def test_group_name_changes_the_etag(app, client):
+  before = etag(client)
+  execute(app, 'UPDATE groups SET name = ? WHERE id = 1', ('Renamed',))
+  assert etag(client) != before
+
+def test_words_change_the_etag(app, client):
+  before = etag(client)
+  execute(app, "UPDATE words SET english = english || '!' WHERE id = (SELECT MIN(word_id) FROM word_groups WHERE group_id = 1)")
+  assert etag(client) != before
+
+def test_msgpack_clients_get_json(client):
+  response = client.get('/groups/1/words/raw', headers={'Accept': 'application/msgpack'})
+  assert response.mimetype == 'application/json'
+  assert response.json['count'] == 60
+  assert 'Accept' not in response.vary
+  assert response.headers['ETag'] == etag(client)
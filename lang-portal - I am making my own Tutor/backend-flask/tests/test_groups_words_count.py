@@ -0,0 +1,110 @@
+import os
+import shutil
+import sqlite3
+from contextlib import contextmanager
+
+import pytest
+from invoke import Context
+
+import tasks
+from lib.db import Db
+from migrate import MIGRATIONS_DIR, run_migrations
+
+# pytest-flask runs every test inside a GET request context, which the Db
+# serves from read-only connections. Writes go through a POST context with its
+# own app context, so the writer is handed back when it ends.
+@contextmanager
+def writing(app):
+  with app.test_request_context(method='POST'), app.app_context():
+    yield
+
+def words_counts(app):
+  connection = sqlite3.connect(app.config['DATABASE'])
+  try:
+    return dict(connection.execute('SELECT id, words_count FROM groups ORDER BY id'))
+  finally:
+    connection.close()
+
+def execute(app, sql, parameters=()):
+  with writing(app):
+    app.db.cursor().execute(sql, parameters)
+    app.db.commit()
+
+# A word of group 2 that isn't in group 1 yet
+def adjective_id(app):
+  with app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute('SELECT MIN(word_id) FROM word_groups WHERE group_id = 2')
+    return cursor.fetchone()[0]
+
+def test_seeded_counts_match_word_groups(app):
+  assert words_counts(app) == {1: 60, 2: 64}
+  with app.app_context():
+    assert app.db.verify_words_count() == []
+
+def test_insert_trigger(app):
+  execute(app, 'INSERT INTO word_groups (group_id, word_id) VALUES (1, ?)', (adjective_id(app),))
+  assert words_counts(app) == {1: 61, 2: 64}
+
+def test_delete_trigger(app):
+  execute(app, 'DELETE FROM word_groups WHERE group_id = 2 AND word_id = ?', (adjective_id(app),))
+  assert words_counts(app) == {1: 60, 2: 63}
+
+def test_update_of_group_id_moves_the_count(app):
+  execute(app, 'UPDATE word_groups SET group_id = 1 WHERE group_id = 2 AND word_id = ?', (adjective_id(app),))
+  assert words_counts(app) == {1: 61, 2: 63}
+
+def test_update_without_group_change_keeps_the_count(app):
+  execute(app, 'UPDATE word_groups SET group_id = 2 WHERE group_id = 2')
+  assert words_counts(app) == {1: 60, 2: 64}
+
+def test_backfill(app, tmp_path):
+  # Apply everything before 0011 to a new database, drift the counts, then
+  # let 0011 backfill them
+  migrations = tmp_path / 'migrations'
+  migrations.mkdir()
+  for name in sorted(os.listdir(MIGRATIONS_DIR)):
+    if name < '0011':
+      shutil.copy(os.path.join(MIGRATIONS_DIR, name), migrations)
+
+  database = app.config['DATABASE']
+  app.db.dispose()
+  os.remove(database)
+  with writing(app):
+    app.db.init(app)
+  run_migrations(db_path=database, migrations_dir=str(migrations))
+  execute(app, 'UPDATE groups SET words_count = CASE id WHEN 1 THEN NULL ELSE 7 END')
+
+  shutil.copy(os.path.join(MIGRATIONS_DIR, '0011_groups_words_count.sql'), migrations)
+  assert run_migrations(db_path=database, migrations_dir=str(migrations)) == ['0011_groups_words_count.sql']
+  assert words_counts(app) == {1: 60, 2: 64}
+
+# The task uses the module's Db and keeps its connection until the process
+# exits, so every run gets a Db of its own on the test database
+def verify_words_count(app, monkeypatch, **kwargs):
+  monkeypatch.setattr(tasks, 'db', Db(database=app.config['DATABASE']))
+  with writing(app):
+    tasks.verify_words_count(Context(), **kwargs)
+
+@pytest.fixture
+def drifted(app):
+  # Counts written behind the triggers' back
+  execute(app, 'UPDATE groups SET words_count = 5 WHERE id = 1')
+  execute(app, 'UPDATE groups SET words_count = NULL WHERE id = 2')
+  return app
+
+def test_verify_words_count_reports_drift(drifted, monkeypatch, capsys):
+  with pytest.raises(SystemExit, match='2 group'):
+    verify_words_count(drifted, monkeypatch)
+  output = capsys.readouterr().out
+  assert 'Group 1 (Core Verbs): words_count 5, actual 60' in output
+  assert 'Group 2 (Core Adjectives): words_count None, actual 64' in output
+  assert words_counts(drifted) == {1: 5, 2: None}
+
+def test_verify_words_count_repair(drifted, monkeypatch, capsys):
+  verify_words_count(drifted, monkeypatch, repair=True)
+  assert 'Repaired 2 group(s).' in capsys.readouterr().out
+  assert words_counts(drifted) == {1: 60, 2: 64}
+
+  verify_words_count(drifted, monkeypatch)
+  assert 'Every groups.words_count matches word_groups.' in capsys.readouterr().out
@@ -0,0 +1,17 @@
+import pytest
+
+def test_metrics_are_off_by_default(app, client):
+  assert client.get('/metrics').status_code == 404
+  assert all(pool.profiler is None for pool in app.db.pools)
+
+class TestEnabled:
+  @pytest.fixture
+  def config(self):
+    return {'METRICS': True}
+
+  def test_metrics_endpoint(self, app, client):
+    assert client.get('/groups').status_code == 200
+    response = client.get('/metrics')
+    assert response.status_code == 200
+    assert 'lang_portal_http_requests_total{endpoint="get_groups",method="GET",status="200"} 1' in response.text
+    assert 'lang_portal_sql_time_per_request_seconds_count{endpoint="get_groups"} 1' in response.text
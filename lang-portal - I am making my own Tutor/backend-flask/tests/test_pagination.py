@@ -0,0 +1,32 @@
+import sqlite3
+
+import pytest
+
+from lib.pagination import keyset_page
+
+@pytest.mark.parametrize('url', [
+  '/api/study-activities/1/sessions?per_page=0&cursor=',
+  '/api/study-activities/1/sessions?per_page=0',
+  '/api/study-activities/1/sessions?per_page=-5&cursor=',
+  '/api/study-sessions?per_page=0&cursor=',
+  '/api/study-sessions?per_page=0',
+  '/api/study-sessions/1?per_page=0'
+])
+def test_per_page_below_one_is_rejected(app, client, url):
+  connection = sqlite3.connect(app.config['DATABASE'])
+  connection.execute('INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1)')
+  connection.commit()
+  connection.close()
+
+  response = client.get(url)
+  assert response.status_code == 400
+  assert response.get_json() == {'error': 'per_page must be at least 1'}
+
+def test_keyset_page_needs_a_positive_page_size():
+  with pytest.raises(ValueError):
+    keyset_page([{'id': 1, 'sort_key': 'a'}], 0, 'created_at', 'desc')
+
+def test_cursor_pages_of_activity_sessions(client):
+  response = client.get('/api/study-activities/1/sessions?per_page=1&cursor=')
+  assert response.status_code == 200
+  assert response.get_json() == {'items': [], 'per_page': 1, 'next_cursor': None}
@@ -0,0 +1,143 @@
+import gc
+import os
+import sqlite3
+import time
+
+from lib.db import PoolTimeout
+from lib.review_buffer import ReviewBuffer
+
+REVIEWS = [{'word_id': 1, 'is_correct': True}, {'word_id': 2, 'is_correct': False}]
+
+# Stands in for the app's Db, failing the first few writes the way a writer
+# that can't be acquired in time does
+class FlakyDb:
+  def __init__(self, db, failures):
+    self.db = db
+    self.failures = failures
+
+  def for_learner(self, learner_id):
+    if self.failures:
+      self.failures -= 1
+      raise PoolTimeout('No database connection available after 10.0s')
+    return self.db.for_learner(learner_id)
+
+def study_session(app):
+  connection = sqlite3.connect(app.config['DATABASE'])
+  try:
+    cursor = connection.execute('INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1)')
+    connection.commit()
+    return cursor.lastrowid
+  finally:
+    connection.close()
+
+def review_items(app, study_session_id):
+  connection = sqlite3.connect(app.config['DATABASE'])
+  try:
+    return connection.execute(
+      'SELECT COUNT(*) FROM word_review_items WHERE study_session_id = ?', (study_session_id,)
+    ).fetchone()[0]
+  finally:
+    connection.close()
+
+def wait_for(condition, timeout=5.0):
+  deadline = time.monotonic() + timeout
+  while not condition():
+    assert time.monotonic() < deadline, 'timed out'
+    time.sleep(0.01)
+
+def test_flush_retries_after_pool_timeout(app):
+  session_id = study_session(app)
+  buffer = ReviewBuffer(FlakyDb(app.db, failures=3), interval_ms=5, max_backoff=0.05)
+  try:
+    buffer.put(session_id, REVIEWS, 'retry-1')
+    wait_for(lambda: buffer.stats()['rows_flushed'] == 2)
+    stats = buffer.stats()
+    assert stats['retried'] == 3
+    assert stats['failed'] == 0
+    assert stats['pending_rows'] == 0
+    assert buffer.pending('retry-1') is None
+    assert review_items(app, session_id) == 2
+
+    # The flush thread survived and keeps writing
+    buffer.put(session_id, REVIEWS, 'retry-2')
+    wait_for(lambda: buffer.stats()['rows_flushed'] == 4)
+    assert review_items(app, session_id) == 4
+  finally:
+    buffer.close()
+
+def test_failing_submissions_stay_queued(app):
+  session_id = study_session(app)
+  buffer = ReviewBuffer(FlakyDb(app.db, failures=1000), interval_ms=5, max_backoff=0.05)
+  try:
+    buffer.put(session_id, REVIEWS, 'stuck')
+    wait_for(lambda: buffer.stats()['retried'] >= 3)
+    assert buffer.stats()['pending_rows'] == 2
+    assert buffer.pending('stuck') == session_id
+    assert buffer._thread.is_alive()
+  finally:
+    buffer.close()
+  assert review_items(app, session_id) == 0
+
+def test_unwritten_submissions_stay_in_the_journal(app, tmp_path):
+  session_id = study_session(app)
+  journal = str(tmp_path / 'reviews.journal')
+  buffer = ReviewBuffer(FlakyDb(app.db, failures=1000), interval_ms=5, max_backoff=0.05, journal_path=journal)
+  buffer.put(session_id, REVIEWS, 'journaled')
+  wait_for(lambda: buffer.stats()['retried'] >= 1)
+  buffer.close()
+
+  # The next start replays it once the database is back
+  buffer = ReviewBuffer(app.db, interval_ms=5, journal_path=journal)
+  try:
+    assert buffer.stats()['replayed'] == 1
+    wait_for(lambda: buffer.stats()['rows_flushed'] == 2)
+    assert review_items(app, session_id) == 2
+  finally:
+    buffer.close()
+
+def test_journal_is_emptied_once_everything_is_written(app, tmp_path):
+  session_id = study_session(app)
+  journal = str(tmp_path / 'reviews.journal')
+  buffer = ReviewBuffer(app.db, interval_ms=5, journal_path=journal)
+  try:
+    buffer.put(session_id, REVIEWS, 'journal-1')
+    assert os.path.getsize(journal) > 0
+    wait_for(lambda: buffer.stats()['rows_flushed'] == 2)
+    wait_for(lambda: os.path.getsize(journal) == 0)
+  finally:
+    buffer.close()
+
+def test_key_of_another_session_is_rejected(app):
+  session_id, other_id = study_session(app), study_session(app)
+  connection = sqlite3.connect(app.config['DATABASE'])
+  try:
+    connection.execute('''
+      INSERT INTO review_submissions (idempotency_key, study_session_id, reviews_count)
+      VALUES ('taken', ?, 2)
+    ''', (other_id,))
+    connection.commit()
+  finally:
+    connection.close()
+
+  buffer = ReviewBuffer(app.db, interval_ms=5)
+  try:
+    buffer.put(session_id, REVIEWS, 'taken')
+    buffer.put(session_id, REVIEWS, 'free')
+    wait_for(lambda: buffer.stats()['pending_rows'] == 0)
+    assert buffer.stats()['rejected'] == 1
+    assert review_items(app, session_id) == 2
+    assert review_items(app, other_id) == 0
+  finally:
+    buffer.close()
+
+# Stands in for the Flask app, which init_app only needs to hold attributes
+class App:
+  pass
+
+def test_closed_with_the_app(app):
+  buffer = ReviewBuffer(app.db, interval_ms=5)
+  owner = App()
+  buffer.init_app(owner)
+  del owner
+  gc.collect()
+  assert not buffer._thread.is_alive()
@@ -0,0 +1,35 @@
+import pytest
+
+from lib import serialization
+
+needs_msgpack = pytest.mark.skipif(serialization.msgpack is None, reason='msgpack is not installed')
+
+@pytest.mark.parametrize('accept', [
+  None,
+  '*/*',
+  'application/*',
+  'text/html,application/xhtml+xml,application/xml;q=0.9,image/avif,image/webp,*/*;q=0.8',
+  'application/json, text/plain, */*',
+  'application/json, application/msgpack',
+  'application/msgpack;q=0.5, application/json'
+])
+def test_json_unless_msgpack_is_preferred(client, accept):
+  headers = {'Accept': accept} if accept else {}
+  response = client.get('/groups', headers=headers)
+  assert response.status_code == 200
+  assert response.mimetype == 'application/json'
+  assert response.get_json()['groups']
+
+@needs_msgpack
+@pytest.mark.parametrize('accept', [
+  'application/msgpack',
+  'application/x-msgpack',
+  'application/msgpack, */*;q=0.1',
+  'application/msgpack, application/json;q=0.9'
+])
+def test_msgpack_when_named_and_preferred(client, accept):
+  response = client.get('/groups', headers={'Accept': accept})
+  assert response.status_code == 200
+  assert response.mimetype == 'application/msgpack'
+  assert serialization.msgpack.unpackb(response.data)['groups']
+  assert 'Accept' in response.vary
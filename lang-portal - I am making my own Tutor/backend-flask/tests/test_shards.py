@@ -0,0 +1,103 @@
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+LEARNER = {'X-Learner-Id': 'alice'}
+
+@pytest.fixture
+def config(tmp_path):
+  return {'SHARDING': True, 'SHARD_DIR': str(tmp_path / 'shards')}
+
+# pytest-flask runs every test inside a GET request context, which the Db
+# serves from read-only connections. Writes go through a POST context with its
+# own app context, so the writer is handed back when it ends.
+@contextmanager
+def writing(app):
+  with app.test_request_context(method='POST'), app.app_context():
+    yield
+
+# Write to the shared database through Db, so table versions are bumped
+def execute(app, sql, parameters=()):
+  with writing(app):
+    cursor = app.db.cursor()
+    cursor.execute(sql, parameters)
+    app.db.commit()
+    return cursor.lastrowid
+
+def shard_rows(app, sql, parameters=()):
+  connection = sqlite3.connect(f"{app.config['SHARD_DIR']}/alice.db")
+  try:
+    return connection.execute(sql, parameters).fetchall()
+  finally:
+    connection.close()
+
+def test_new_words_reach_an_open_shard(app, client):
+  assert client.get('/words', headers=LEARNER).status_code == 200
+  word_id = execute(app, '''
+    INSERT INTO words (kanji, romaji, english, parts) VALUES ('新', 'shin', 'new', '[]')
+  ''')
+  execute(app, 'INSERT INTO word_groups (group_id, word_id) VALUES (1, ?)', (word_id,))
+
+  # Ties are broken by id, so the new word leads
+  response = client.get('/words?sort_by=correct_count&order=desc', headers=LEARNER)
+  assert response.get_json()['words'][0]['id'] == word_id
+  assert shard_rows(app, 'SELECT correct_count, wrong_count FROM word_reviews WHERE word_id = ?', (word_id,)) == [(0, 0)]
+  assert shard_rows(app, 'SELECT group_id FROM word_schedules WHERE word_id = ?', (word_id,)) == [(1,)]
+  assert app.db.shards.stats()['refreshed'] == 1
+
+def test_removed_memberships_leave_the_schedule(app, client):
+  assert client.get('/words', headers=LEARNER).status_code == 200
+  execute(app, 'DELETE FROM word_groups WHERE group_id = 1 AND word_id = 1')
+  assert client.get('/words', headers=LEARNER).status_code == 200
+  assert shard_rows(app, 'SELECT * FROM word_schedules WHERE group_id = 1 AND word_id = 1') == []
+
+def test_unchanged_vocabulary_is_not_refreshed(app, client):
+  for _ in range(3):
+    assert client.get('/words', headers=LEARNER).status_code == 200
+  assert app.db.shards.stats()['refreshed'] == 0
+
+def test_evicted_shard_drains_and_comes_back(app):
+  router = app.db.shards
+  router.max_open = 1
+  shard = router.get('alice')
+  connection = shard.writer.acquire()
+
+  router.get('bob')
+  assert router.stats()['draining'] == 1
+  # Still usable by the request that holds it
+  connection.execute('SELECT 1')
+  # The learner's next request gets the same shard, not a second writer
+  assert router.get('alice') is shard
+  assert router.stats()['opened'] == 2
+  shard.writer.release(connection)
+
+  router.get('bob')
+  router.get('carol')
+  assert router.stats()['draining'] == 0
+
+def test_shards_open_outside_the_router_lock(app, monkeypatch):
+  router = app.db.shards
+  router.get('alice')
+  opening, release = threading.Event(), threading.Event()
+  open_shard = router.open
+
+  def slow_open(learner_id):
+    opening.set()
+    release.wait(5)
+    return open_shard(learner_id)
+  monkeypatch.setattr(router, 'open', slow_open)
+
+  shards = []
+  threads = [threading.Thread(target=lambda: shards.append(router.get('bob'))) for _ in range(2)]
+  for thread in threads:
+    thread.start()
+  assert opening.wait(5)
+  # Other learners are served while bob's shard opens
+  assert router.get('alice') is not None
+  release.set()
+  for thread in threads:
+    thread.join(5)
+  assert len(shards) == 2 and shards[0] is shards[1]
+  assert router.stats()['opened'] == 2
@@ -0,0 +1,43 @@
+import json
+import logging
+
+import pytest
+
+@pytest.fixture
+def config(tmp_path):
+  config = {
+    'SQL_PROFILE': True,
+    'SQL_SLOW_QUERY_MS': 0,
+    'SQL_SLOW_QUERY_LOG': str(tmp_path / 'slow_queries.log')
+  }
+  yield config
+  # The slow-query logger is process-wide: close this test's log file
+  logger = logging.getLogger('lang_portal.slow_queries')
+  for handler in list(logger.handlers):
+    if getattr(handler, 'baseFilename', None) == config['SQL_SLOW_QUERY_LOG']:
+      logger.removeHandler(handler)
+      handler.close()
+
+def test_executemany_keeps_only_the_parameter_shape(app):
+  rows = ((word_id, f'secret {word_id}') for word_id in range(1, 4))
+  with app.test_request_context(method='POST'), app.app_context():
+    cursor = app.db.cursor()
+    cursor.execute('CREATE TEMP TABLE notes (word_id INTEGER, note TEXT)')
+    cursor.executemany('INSERT INTO notes (word_id, note) VALUES (?, ?)', rows)
+    entry = cursor.profile_entry
+    assert 'parameters' not in entry
+    assert entry['shape'] == ['int', 'str']
+    assert entry['executions'] == 3
+    assert entry['rows'] == 3
+
+def test_slow_query_log_has_no_parameter_values(app, client, config):
+  response = client.get('/words?ids=1,2')
+  assert response.status_code == 200
+  assert response.headers['X-SQL-Profile'].startswith('queries=')
+
+  with open(config['SQL_SLOW_QUERY_LOG']) as log:
+    entries = [json.loads(line) for line in log]
+  lookup = next(entry for entry in entries if 'json_each' in entry['sql'])
+  assert lookup['parameters_shape'] == ['str']
+  assert lookup['query_plan']
+  assert '[1, 2]' not in json.dumps(entries)
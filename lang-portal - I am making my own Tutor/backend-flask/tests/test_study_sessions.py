@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+REVIEWS = [{'word_id': 1, 'is_correct': True}, {'word_id': 2, 'is_correct': False}]
+
+@pytest.fixture
+def session_id(app):
+  connection = sqlite3.connect(app.config['DATABASE'])
+  try:
+    cursor = connection.execute('INSERT INTO study_sessions (group_id, study_activity_id) VALUES (1, 1)')
+    # Fails every review of word 2, like a CHECK or NOT NULL violation would
+    connection.execute('''
+      CREATE TRIGGER reject_word_2 BEFORE INSERT ON word_review_items
+      WHEN NEW.word_id = 2
+      BEGIN
+        SELECT RAISE(ABORT, 'rejected');
+      END
+    ''')
+    connection.commit()
+    return cursor.lastrowid
+  finally:
+    connection.close()
+
+def stored(app, session_id):
+  connection = sqlite3.connect(app.config['DATABASE'])
+  try:
+    items = connection.execute(
+      'SELECT COUNT(*) FROM word_review_items WHERE study_session_id = ?', (session_id,)
+    ).fetchone()[0]
+    keys = [row[0] for row in connection.execute('SELECT idempotency_key FROM review_submissions')]
+    return items, keys
+  finally:
+    connection.close()
+
+def test_review_submission_is_written_once(client, app, session_id):
+  url = f'/api/study-sessions/{session_id}/review'
+  headers = {'Idempotency-Key': 'once'}
+  reviews = [{'word_id': 1, 'is_correct': True}]
+
+  response = client.post(url, json={'reviews': reviews}, headers=headers)
+  assert response.status_code == 201
+  assert response.get_json()['replayed'] is False
+
+  response = client.post(url, json={'reviews': reviews}, headers=headers)
+  assert response.status_code == 200
+  assert response.get_json() == {'study_session_id': session_id, 'reviews_count': 1, 'replayed': True}
+  assert stored(app, session_id) == (1, ['once'])
+
+@pytest.mark.parametrize('headers', [{}, {'Idempotency-Key': 'failed'}])
+def test_constraint_failure_is_not_a_replay(client, app, session_id, headers):
+  response = client.post(f'/api/study-sessions/{session_id}/review', json={'reviews': REVIEWS}, headers=headers)
+  assert response.status_code == 500
+  assert 'replayed' not in response.get_json()
+  assert stored(app, session_id) == (0, [])
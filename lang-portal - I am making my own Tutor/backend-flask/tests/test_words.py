@@ -0,0 +1,54 @@
+import pytest
+
+def test_batch_lookup_keeps_order_and_reports_missing(client):
+  response = client.get('/words?ids=3,1,999999,3')
+  assert response.status_code == 200
+  body = response.get_json()
+  assert [word['id'] for word in body['words']] == [3, 1]
+  assert body['missing'] == [999999]
+  assert body['words'][0]['groups'] == [{'id': 1, 'name': 'Core Verbs'}]
+
+def test_batch_lookup_accepts_the_64_bit_bounds(client):
+  response = client.get(f'/words?ids=1,{2 ** 63 - 1},{-2 ** 63}')
+  assert response.status_code == 200
+  assert response.get_json()['missing'] == [2 ** 63 - 1, -2 ** 63]
+
+@pytest.mark.parametrize('ids', [
+  '',
+  ',',
+  'one',
+  '1,two',
+  '1.5',
+  str(2 ** 63),
+  str(-2 ** 63 - 1),
+  '9999999999999999999999',
+  ','.join(str(word_id) for word_id in range(1, 502))
+])
+def test_batch_lookup_rejects_bad_ids(client, ids):
+  response = client.get(f'/words?ids={ids}')
+  assert response.status_code == 400
+  assert 'error' in response.get_json()
+
+def walk(client, path):
+  ids, cursor = [], ''
+  while cursor is not None:
+    body = client.get(f'{path}&cursor={cursor}').get_json()
+    ids.extend(word['id'] for word in body['words'])
+    cursor = body['next_cursor']
+  return ids
+
+@pytest.mark.parametrize('sort_by', ['kanji', 'romaji', 'english', 'correct_count', 'wrong_count'])
+@pytest.mark.parametrize('order', ['asc', 'desc'])
+def test_group_words_cursor_walk_matches_pages(client, sort_by, order):
+  path = f'/groups/1/words?sort_by={sort_by}&order={order}'
+  first = client.get(path).get_json()
+  paged = []
+  for page in range(1, first['total_pages'] + 1):
+    paged.extend(word['id'] for word in client.get(f'{path}&page={page}').get_json()['words'])
+  assert len(paged) == len(set(paged)) == 60
+  assert walk(client, path) == paged
+
+def test_group_words_sort_unreviewed_words_by_counts(client):
+  words = client.get('/groups/1/words?sort_by=correct_count&order=desc').get_json()['words']
+  assert len(words) == 10
+  assert all(word['correct_count'] == 0 and word['wrong_count'] == 0 for word in words)
@@ -14,6 +14,7 @@ import { createStudySession } from '@/services/api'
 type Group = {
   id: number
   name: string
+  due_url: string
 }
 
 type StudyActivity = {
@@ -73,6 +74,12 @@ export default function StudyActivityLaunch() {
       const launchUrl = new URL(launchData.activity.launch_url);
       launchUrl.searchParams.set('group_id', selectedGroup);
       launchUrl.searchParams.set('session_id', sessionId.toString());
+
+      // The activity loads the words to study from the group's due queue
+      const group = launchData.groups.find(g => g.id.toString() === selectedGroup);
+      if (group) {
+        launchUrl.searchParams.set('words_url', new URL(group.due_url, 'http://localhost:5000').toString());
+      }
       
       // Open the modified URL in a new tab
       window.open(launchUrl.toString(), '_blank');
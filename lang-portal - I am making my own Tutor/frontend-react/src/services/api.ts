@@ -156,6 +156,20 @@ export const fetchWordDetails = async (wordId: number): Promise<Word> => {
   return data.word;
 };
 
+export interface WordsByIdsResponse {
+  words: Word[];
+  missing: number[];
+}
+
+// Fetch many words (with their groups) in one request instead of one per word
+export const fetchWordsByIds = async (wordIds: number[]): Promise<WordsByIdsResponse> => {
+  const response = await fetch(`${API_BASE_URL}/words?ids=${wordIds.join(',')}`);
+  if (!response.ok) {
+    throw new Error('Failed to fetch words');
+  }
+  return response.json();
+};
+
 // Study Session API
 export const createStudySession = async (
   groupId: number,
@@ -177,16 +191,22 @@ export const createStudySession = async (
   return response.json();
 };
 
+// Submits a whole round of reviews in one request. Reuse the same
+// idempotencyKey when retrying so the round is only recorded once.
+// Pass endSession on the last round to record when the session ended.
 export const submitStudySessionReview = async (
   sessionId: number,
-  reviews: WordReview[]
+  reviews: WordReview[],
+  idempotencyKey?: string,
+  endSession = false
 ): Promise<void> => {
-  const response = await fetch(`${API_BASE_URL}/study_sessions/${sessionId}/review`, {
+  const response = await fetch(`${API_BASE_URL}/api/study-sessions/${sessionId}/review`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
+      ...(idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {}),
     },
-    body: JSON.stringify({ reviews }),
+    body: JSON.stringify({ reviews, end_session: endSession }),
   });
   if (!response.ok) {
     throw new Error('Failed to submit study session review');